@@ -0,0 +1,311 @@
+import numpy as np
+from threading import RLock
+
+
+# Initial number of rows allocated for the columns
+INITIAL_CAPACITY: int = 1024
+
+# Initialize the narrowest volume bucket in seconds, narrower
+# buckets overflow the int64 bucket numbers
+MIN_BUCKET: float = 1.0
+
+
+class ChainColumns:
+    """
+    Columnar export of all transactions in a chain,
+    built incrementally as blocks are added
+
+    Attributes:
+        amounts    : amount of every transaction
+        timestamps : timestamp of the block of every transaction
+        block_index: index of the block of every transaction
+        sender     : dictionary encoded sender of every transaction
+        recipient  : dictionary encoded recipient of every transaction
+        keys       : addresses, position in the list is the encoded id
+        base       : balances of the blocks folded into a checkpoint
+        base_length: number of blocks folded into the base balances
+    """
+
+    def __init__(self, chain=()) -> None:
+        # readers take the lock too, the buffers are swapped
+        # and the size moves while blocks are appended
+        self.__lock = RLock()
+        self.__ids = {}
+        self.keys = []
+        self.base = {}
+        self.base_length = 0
+        self.__size = 0
+        self.__allocate(INITIAL_CAPACITY)
+        self.extend(chain)
+
+    def __allocate(self, capacity) -> None:
+        """
+        Grow (or create) the column buffers
+
+        Args:
+            capacity: the new number of rows
+        """
+        size = self.__size
+        columns = (
+            ("_amounts", np.float64),
+            ("_timestamps", np.float64),
+            ("_block_index", np.int64),
+            ("_sender", np.int32),
+            ("_recipient", np.int32),
+        )
+        for name, dtype in columns:
+            buffer = np.empty(capacity, dtype=dtype)
+            if size:
+                buffer[:size] = getattr(self, name)[:size]
+            setattr(self, name, buffer)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __encode(self, address) -> int:
+        """
+        Return the id of an address, assigning
+        a new one if it was never seen
+
+        Args:
+            address: public key or "MINING"
+        """
+        address_id = self.__ids.get(address)
+        if address_id is None:
+            address_id = len(self.keys)
+            self.__ids[address] = address_id
+            self.keys.append(address)
+        return address_id
+
+    def append_block(self, block) -> None:
+        """
+        Append the transactions of a block
+
+        Args:
+            block: the block to add
+        """
+        rows = len(block.transactions)
+        with self.__lock:
+            start = self.__size
+            end = start + rows
+            if end > len(self._amounts):
+                self.__allocate(max(end, 2 * len(self._amounts)))
+            for row, tx in enumerate(block.transactions, start):
+                self._amounts[row] = tx.amount
+                self._sender[row] = self.__encode(tx.sender)
+                self._recipient[row] = self.__encode(tx.recipient)
+            self._timestamps[start:end] = block.timestamp
+            self._block_index[start:end] = block.index
+            self.__size = end
+
+    def extend(self, chain) -> None:
+        """
+        Append the transactions of several blocks
+
+        Args:
+            chain: the blocks to add
+        """
+        for block in chain:
+            self.append_block(block)
+
+    def reset(self, chain=(), checkpoint=None) -> None:
+        """
+        Drop all rows and rebuild the columns from a chain,
+        blocks up to a checkpoint are taken from its balances
+
+        Args:
+            chain: the blocks to add
+            checkpoint: state of the chain up to a pruned block
+        """
+        with self.__lock:
+            self.__ids = {}
+            self.keys = []
+            self.__size = 0
+            self.base = {} if checkpoint is None else dict(checkpoint.balances)
+            self.base_length = 0 if checkpoint is None else checkpoint.index + 1
+            self.extend(block for block in chain if block.index >= self.base_length)
+
+    def fold(self, length) -> dict:
+        """
+        Move the rows of all blocks before an index into
+        the base balances, return the base balances
+
+        Args:
+            length: number of blocks to fold
+        """
+        with self.__lock:
+            count = int(np.searchsorted(self.block_index, length, side="left"))
+            size = len(self.keys)
+            received = np.bincount(
+                self._recipient[:count], weights=self._amounts[:count], minlength=size
+            )
+            sent = np.bincount(
+                self._sender[:count], weights=self._amounts[:count], minlength=size
+            )
+            for address_id in np.flatnonzero(received - sent).tolist():
+                address = self.keys[address_id]
+                self.base[address] = self.base.get(address, 0.0) + float(
+                    received[address_id] - sent[address_id]
+                )
+            for column in (
+                self._amounts,
+                self._timestamps,
+                self._block_index,
+                self._sender,
+                self._recipient,
+            ):
+                column[: self.__size - count] = column[count : self.__size]
+            self.__size -= count
+            self.base_length = max(self.base_length, length)
+            return dict(self.base)
+
+    def truncate(self, length) -> None:
+        """
+        Drop the rows of all blocks from an index onwards
+
+        Args:
+            length: number of blocks to keep
+        """
+        with self.__lock:
+            self.__size = int(
+                np.searchsorted(self.block_index, length, side="left")
+            )
+
+    @property
+    def amounts(self):
+        return self._amounts[: self.__size]
+
+    @property
+    def timestamps(self):
+        return self._timestamps[: self.__size]
+
+    @property
+    def block_index(self):
+        return self._block_index[: self.__size]
+
+    @property
+    def sender(self):
+        return self._sender[: self.__size]
+
+    @property
+    def recipient(self):
+        return self._recipient[: self.__size]
+
+    def address_id(self, address) -> int:
+        """
+        Return the id of an address or None if
+        it never took part in a transaction
+
+        Args:
+            address: public key or "MINING"
+        """
+        return self.__ids.get(address)
+
+    def totals(self) -> tuple:
+        """
+        Return the amounts sent and received
+        per address id
+        """
+        with self.__lock:
+            size = len(self.keys)
+            sent = np.bincount(self.sender, weights=self.amounts, minlength=size)
+            received = np.bincount(self.recipient, weights=self.amounts, minlength=size)
+            return sent, received
+
+    def balances(self) -> dict:
+        """
+        Return the balance of every address
+        """
+        with self.__lock:
+            sent, received = self.totals()
+            balances = dict(self.base)
+            for address, amount in zip(self.keys, (received - sent).tolist()):
+                balances[address] = balances.get(address, 0.0) + amount
+            return balances
+
+    def balance(self, address) -> float:
+        """
+        Return the balance of a single address
+
+        Args:
+            address: public key of the participant
+        """
+        with self.__lock:
+            base = self.base.get(address, 0.0)
+            address_id = self.__ids.get(address)
+            if address_id is None:
+                return base
+            amounts = self.amounts
+            received = amounts[self.recipient == address_id].sum()
+            sent = amounts[self.sender == address_id].sum()
+            return base + float(received - sent)
+
+    def top_senders(self, n=10) -> list:
+        """
+        Return the n addresses which sent the most
+        coins, mining rewards are not counted
+
+        Args:
+            n: number of addresses to return
+        """
+        with self.__lock:
+            sent, _ = self.totals()
+            mining_id = self.__ids.get("MINING")
+            if mining_id is not None:
+                sent[mining_id] = 0.0
+            order = np.argsort(sent)[::-1][:n]
+            return [
+                {"address": self.keys[i], "amount": float(sent[i])}
+                for i in order
+                if sent[i] > 0
+            ]
+
+    def volume_over_time(self, bucket=3600.0) -> list:
+        """
+        Return the transferred volume per time bucket,
+        mining rewards are not counted
+
+        Args:
+            bucket: width of a bucket in seconds
+        """
+        with self.__lock:
+            mask = np.ones(len(self), dtype=bool)
+            mining_id = self.__ids.get("MINING")
+            if mining_id is not None:
+                mask = self.sender != mining_id
+            if not mask.any():
+                return []
+            buckets = np.floor(self.timestamps[mask] / bucket).astype(np.int64)
+            starts, inverse = np.unique(buckets, return_inverse=True)
+            volume = np.bincount(inverse, weights=self.amounts[mask])
+            return [
+                {"start": float(start * bucket), "volume": float(amount)}
+                for start, amount in zip(starts, volume)
+            ]
+
+    def summary(self, top=10, bucket=3600.0) -> dict:
+        """
+        Return an overview of the chain, blocks folded
+        into a checkpoint only count as pruned blocks
+
+        Args:
+            top: number of top senders
+            bucket: width of a volume bucket in seconds
+        """
+        with self.__lock:
+            mining_id = self.__ids.get("MINING")
+            if mining_id is None:
+                transfers = np.ones(len(self), dtype=bool)
+            else:
+                transfers = self.sender != mining_id
+            return {
+                "blocks": int(np.unique(self.block_index).size),
+                "pruned_blocks": self.base_length,
+                "transactions": int(transfers.sum()),
+                "mining_rewards": int((~transfers).sum()),
+                "addresses": len(self.keys),
+                "volume": float(self.amounts[transfers].sum()),
+                "minted": float(self.amounts[~transfers].sum()),
+                "top_senders": self.top_senders(top),
+                "volume_over_time": self.volume_over_time(bucket),
+            }
@@ -0,0 +1,70 @@
+import json
+from time import perf_counter
+from argparse import ArgumentParser
+
+from transact.wallet import Wallet
+from transact.transaction import SCHEME_ED25519, SCHEME_RSA, Transaction
+
+
+def bench_scheme(key_type, count) -> dict:
+    """
+    Sign and verify transactions with one signature
+    scheme and return throughput and size figures
+
+    Args:
+        key_type: "rsa" or "ed25519"
+        count: number of transactions to sign and verify
+    """
+    wallet = Wallet("bench", key_type)
+    wallet.create_keys()
+    recipient = Wallet("bench", key_type)
+    recipient.create_keys()
+
+    start = perf_counter()
+    transactions = [
+        Transaction(
+            wallet.public_key,
+            recipient.public_key,
+            wallet.sign_transaction(wallet.public_key, recipient.public_key, amount),
+            amount,
+            key_type,
+        )
+        for amount in range(1, count + 1)
+    ]
+    sign_time = perf_counter() - start
+
+    start = perf_counter()
+    valid = all(Wallet.verify_transaction(tx) for tx in transactions)
+    verify_time = perf_counter() - start
+
+    return {
+        "scheme": key_type,
+        "valid": valid,
+        "sign_per_second": count / sign_time,
+        "verify_per_second": count / verify_time,
+        "public_key_bytes": len(wallet.public_key) // 2,
+        "signature_bytes": len(transactions[0].signature) // 2,
+        "transaction_json_bytes": len(json.dumps(transactions[0].__dict__)),
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compare rsa and ed25519 signatures")
+    parser.add_argument("-n", "--count", type=int, default=500)
+    args = parser.parse_args()
+    print(
+        f"{'scheme':<10}{'sign/s':>10}{'verify/s':>10}"
+        f"{'key B':>8}{'sig B':>8}{'tx json B':>11}"
+    )
+    for key_type in (SCHEME_RSA, SCHEME_ED25519):
+        result = bench_scheme(key_type, args.count)
+        if not result["valid"]:
+            print(f"{key_type}: signature verification failed!")
+        print(
+            f"{result['scheme']:<10}"
+            f"{result['sign_per_second']:>10.0f}"
+            f"{result['verify_per_second']:>10.0f}"
+            f"{result['public_key_bytes']:>8}"
+            f"{result['signature_bytes']:>8}"
+            f"{result['transaction_json_bytes']:>11}"
+        )
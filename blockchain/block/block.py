@@ -1,5 +1,24 @@
+import math
 from time import time
 from utility.printable import Printable
+from transact.transaction import Transaction
+from utility.encoding import CURRENT_VERSION, LEGACY_VERSION, transactions_digest
+
+
+def _check_int(value, name, limit) -> None:
+    """
+    Raise an error unless a value is an integer
+    in the range the block encoding can hold
+
+    Args:
+        value: the value to check
+        name: name of the field in error messages
+        limit: first value which is out of range
+    """
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"The {name} of a block has to be an integer")
+    if not 0 <= value < limit:
+        raise ValueError(f"The {name} of a block is out of range")
 
 
 class Block(Printable):
@@ -12,12 +31,111 @@ class Block(Printable):
         transactions : transaction info in the block
         proof        : actaul proof of work
         timestamp    : timestamp for actions
+        version      : encoding version used to hash the block
     """
     def __init__(
-        self, index, previous_hash, transactions, proof, timestamp=time()
+        self,
+        index,
+        previous_hash,
+        transactions,
+        proof,
+        timestamp=None,
+        version=CURRENT_VERSION,
     ) -> None:
         self.index = index
         self.previous_hash = previous_hash
         self.timestamp = time() if timestamp is None else timestamp
         self.transactions = transactions
         self.proof = proof
+        self.version = version
+
+    @staticmethod
+    def from_dict(block) -> "Block":
+        """
+        Return the block for its dictionary form, fields
+        of the wrong type or out of range raise a TypeError
+        or ValueError before the block is hashed
+
+        Args:
+            block: the block as parsed from json
+        """
+        if not isinstance(block, dict):
+            raise TypeError("A block has to be an object")
+        version = block.get("version", LEGACY_VERSION)
+        _check_int(block["index"], "index", 2 ** 64)
+        _check_int(block["proof"], "proof", 2 ** 64)
+        _check_int(version, "version", 2 ** 8)
+        if version not in (LEGACY_VERSION, CURRENT_VERSION):
+            # hashing treats every other version as the current one,
+            # a later encoding could not be told apart from it
+            raise ValueError(f"Unknown block version {version}")
+        if not isinstance(block["previous_hash"], str):
+            raise TypeError("The previous hash of a block has to be a string")
+        timestamp = block["timestamp"]
+        if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+            raise TypeError("The timestamp of a block has to be a number")
+        if not math.isfinite(timestamp):
+            raise ValueError("The timestamp of a block has to be finite")
+        if "tx_digest" in block:
+            tx_digest = block["tx_digest"]
+            if not isinstance(tx_digest, str):
+                raise TypeError("The digest of a block has to be a string")
+            if len(bytes.fromhex(tx_digest)) != 32:
+                raise ValueError("The digest of a block has to be 32 bytes")
+            return PrunedBlock(
+                block["index"],
+                block["previous_hash"],
+                tx_digest,
+                block["proof"],
+                timestamp,
+                version,
+            )
+        if not isinstance(block["transactions"], list):
+            raise TypeError("The transactions of a block have to be a list")
+        return Block(
+            block["index"],
+            block["previous_hash"],
+            [Transaction.from_dict(tx) for tx in block["transactions"]],
+            block["proof"],
+            timestamp,
+            version,
+        )
+
+
+class PrunedBlock(Block):
+    """
+    Represent the header of a block whose transactions
+    were dropped, the header still commits to them by
+    their digest so the hash of the block is unchanged
+
+    Attributes:
+        tx_digest: hex encoded digest of the dropped transactions
+    """
+    def __init__(
+        self,
+        index,
+        previous_hash,
+        tx_digest,
+        proof,
+        timestamp,
+        version=CURRENT_VERSION,
+    ) -> None:
+        super().__init__(index, previous_hash, [], proof, timestamp, version)
+        self.tx_digest = tx_digest
+
+    @classmethod
+    def of(cls, block) -> "PrunedBlock":
+        """
+        Return the pruned form of a block
+
+        Args:
+            block: the block to prune
+        """
+        return cls(
+            block.index,
+            block.previous_hash,
+            transactions_digest(block.transactions).hex(),
+            block.proof,
+            block.timestamp,
+            block.version,
+        )
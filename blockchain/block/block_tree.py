@@ -0,0 +1,218 @@
+from collections import OrderedDict
+
+from utility.hash_util import hash_block
+
+
+# Outcomes of offering a block to the chain
+BLOCK_ADDED: str = "added"
+BLOCK_REORG: str = "reorg"
+BLOCK_SIDE: str = "side"
+BLOCK_ORPHAN: str = "orphan"
+BLOCK_KNOWN: str = "known"
+BLOCK_INVALID: str = "invalid"
+
+# Initialize the limits of the tree
+MAX_ORPHANS: int = 100
+MAX_SIDE_DEPTH: int = 100
+
+
+class BlockTree:
+    """
+    Index of the blocks a node knows about: the active
+    chain by hash, side branches which may still overtake
+    it and orphans whose parent has not arrived yet
+
+    Attributes:
+        active : position of every active block by hash(private)
+        side   : blocks on side branches by hash(private)
+        orphans: blocks with an unknown parent by hash(private)
+    """
+
+    def __init__(self, chain=()) -> None:
+        self.__active = {}
+        self.__side = {}
+        self.__orphans = OrderedDict()
+        self.reset(chain)
+
+    def reset(self, chain) -> None:
+        """
+        Index a new active chain, side branches and
+        orphans are kept
+
+        Args:
+            chain: the active chain
+        """
+        self.__active = {hash_block(block): index for index, block in enumerate(chain)}
+        for block_hash in list(self.__side):
+            if block_hash in self.__active:
+                del self.__side[block_hash]
+
+    def contains(self, block_hash) -> bool:
+        """
+        Return True if the block is on the active
+        chain or on a side branch
+
+        Args:
+            block_hash: hash of the block
+        """
+        return block_hash in self.__active or block_hash in self.__side
+
+    def is_known(self, block_hash) -> bool:
+        """
+        Return True if the block was seen before,
+        orphans included
+
+        Args:
+            block_hash: hash of the block
+        """
+        return self.contains(block_hash) or block_hash in self.__orphans
+
+    def active_index(self, block_hash) -> int:
+        """
+        Return the position of an active block,
+        None if the block is not on the active chain
+
+        Args:
+            block_hash: hash of the block
+        """
+        return self.__active.get(block_hash)
+
+    def height(self, block_hash) -> int:
+        """
+        Return the index of a block on the active
+        chain or a side branch, None if unknown
+
+        Args:
+            block_hash: hash of the block
+        """
+        if block_hash in self.__active:
+            return self.__active[block_hash]
+        block = self.__side.get(block_hash)
+        return None if block is None else block.index
+
+    def push_active(self, block, block_hash=None) -> None:
+        """
+        Record a block appended to the active chain
+
+        Args:
+            block: the appended block
+            block_hash: hash of the block, computed if missing
+        """
+        block_hash = hash_block(block) if block_hash is None else block_hash
+        self.__side.pop(block_hash, None)
+        self.__active[block_hash] = block.index
+
+    def pop_active(self, block) -> None:
+        """
+        Move a block removed from the tip of the active
+        chain to the side branches
+
+        Args:
+            block: the removed block
+        """
+        block_hash = hash_block(block)
+        self.__active.pop(block_hash, None)
+        self.__side[block_hash] = block
+
+    def add_side(self, block, block_hash=None) -> None:
+        """
+        Store a block of a side branch
+
+        Args:
+            block: the block
+            block_hash: hash of the block, computed if missing
+        """
+        block_hash = hash_block(block) if block_hash is None else block_hash
+        self.__side[block_hash] = block
+
+    def discard_side(self, block_hash) -> None:
+        """
+        Forget a block of a side branch, e.g. one
+        whose transactions turned out to be invalid
+
+        Args:
+            block_hash: hash of the block
+        """
+        self.__side.pop(block_hash, None)
+
+    def get_side(self, block_hash):
+        """
+        Return a block of a side branch, None if unknown
+
+        Args:
+            block_hash: hash of the block
+        """
+        return self.__side.get(block_hash)
+
+    def branch(self, tip_hash) -> tuple:
+        """
+        Return (fork_index, blocks) for the side branch
+        ending in a block, where fork_index is the position
+        of the last active block the branch shares and blocks
+        are ordered from the fork to the tip
+
+        Args:
+            tip_hash: hash of the last block of the branch
+        """
+        blocks = []
+        block_hash = tip_hash
+        while block_hash in self.__side:
+            block = self.__side[block_hash]
+            blocks.append(block)
+            block_hash = block.previous_hash
+        if block_hash not in self.__active:
+            return None, []
+        blocks.reverse()
+        return self.__active[block_hash], blocks
+
+    def prune_side(self, tip_index) -> None:
+        """
+        Drop side blocks too far below the tip to
+        ever be switched to
+
+        Args:
+            tip_index: index of the active tip
+        """
+        for block_hash, block in list(self.__side.items()):
+            if block.index < tip_index - MAX_SIDE_DEPTH:
+                del self.__side[block_hash]
+
+    def add_orphan(self, block, block_hash) -> None:
+        """
+        Buffer a block until its parent arrives,
+        the oldest orphan is dropped when the pool
+        is full
+
+        Args:
+            block: the block
+            block_hash: hash of the block
+        """
+        self.__orphans[block_hash] = block
+        while len(self.__orphans) > MAX_ORPHANS:
+            self.__orphans.popitem(last=False)
+
+    def take_orphans(self, parent_hash) -> list:
+        """
+        Remove and return the buffered children of a block
+
+        Args:
+            parent_hash: hash of the parent block
+        """
+        children = [
+            (block_hash, block)
+            for block_hash, block in self.__orphans.items()
+            if block.previous_hash == parent_hash
+        ]
+        for block_hash, _ in children:
+            del self.__orphans[block_hash]
+        return children
+
+    def stats(self) -> dict:
+        """
+        Return the size of the tree
+        """
+        return {
+            "active": len(self.__active),
+            "side": len(self.__side),
+            "orphans": len(self.__orphans),
+        }
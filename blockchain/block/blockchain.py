@@ -1,17 +1,44 @@
+import os
 import json
-import requests
+from uuid import uuid4
 from typing import Any
+from threading import RLock
 from functools import reduce
 
-from block.block import Block
+from block.block import Block, PrunedBlock
+from block.checkpoint import Checkpoint
 from transact.wallet import Wallet
 from utility.hash_util import hash_block
-from transact.transaction import Transaction
-from utility.verification import Verification
+from transact.transaction import SCHEME_RSA, Transaction
+from utility.verification import MINING_REWARD, Verification
+from utility.encoding import LEGACY_VERSION
+from network.peer_manager import PeerManager, local_hosts
+from analytics.columns import ChainColumns
+from storage.store import open_store
+from storage.mapped_chain import MappedChain
+from utility.json_stream import CHUNK_SIZE, iter_json_array
+from utility.event_bus import EventBus
+from block.block_tree import (
+    BLOCK_ADDED,
+    BLOCK_INVALID,
+    BLOCK_KNOWN,
+    BLOCK_ORPHAN,
+    BLOCK_REORG,
+    BLOCK_SIDE,
+    BlockTree,
+)
 
 
-# Initailize the mining reward
-MINING_REWARD: float = 10.0
+# Initialize the number of blocks fetched to connect an orphan
+MAX_FETCH: int = 50
+
+# Initialize the number of blocks pruned at once, so that the
+# chain is not rewritten for every new block
+PRUNE_INTERVAL: int = 10
+
+# Initialize the number of blocks read from a memory mapped
+# chain at once while it is streamed to a peer
+STREAM_BATCH: int = 256
 
 
 class Blockchain:
@@ -22,32 +49,140 @@ class Blockchain:
         genesis_block    : 1st block in the blockchain
         chain            : the actual blockchain(private)
         open_transactions: list of open transactions(private)
-        peer_nodes       : set of unique nodes(private)
+        peers            : peer manager tracking peer health(private)
+        columns          : columnar export of the chain(private)
         public_key       : unique key generated at a node
         node_id          : unique id from a peer node
         resolve_conflicts: boolean to resolve conflicts
+        events           : bus the changes of the node are published on
+        multi_tenant     : the node serves many wallets and needs no key of its own
+        prune            : number of recent blocks whose transactions are kept
+                           (None = keep all)
+        checkpoint       : state of the chain up to the last pruned block(private)
+        mapped           : keep the chain in a memory mapped file
+        store            : persistence of the node(private)
+        tree             : side branches and orphans(private)
+        chain_version    : counter bumped on every change of the block tree(private)
+        mempool_version  : counter bumped on every change of the open transactions(private)
+        state_id         : unique id of this instance, the versions count from it
     """
 
-    def __init__(self, public_key, node_id) -> None:
-        genesis_block = Block(0, "", [], 100, 0)
-        self.__chain = [genesis_block]
+    def __init__(
+        self,
+        public_key,
+        node_id,
+        mapped=False,
+        store="text",
+        events=None,
+        multi_tenant=False,
+        prune=None,
+    ) -> None:
+        genesis_block = self.genesis_block()
+        self.mapped = mapped
+        if mapped:
+            self.__chain = MappedChain(f"blockchain-{node_id}.dat")
+            if len(self.__chain) == 0:
+                self.__chain.append(genesis_block)
+        else:
+            self.__chain = [genesis_block]
         self.__open_transactions = []
-        self.__peer_nodes = set()
+        self.__peers = PeerManager(exclude=local_hosts(node_id))
         self.public_key = public_key
         self.node_id = node_id
-        self.resolve_conflicts = False
+        self.__resolve_conflicts = False
+        self.multi_tenant = multi_tenant
+        self.prune = prune
+        self.__checkpoint = None
+        self.events = EventBus() if events is None else events
+        self.__columns = ChainColumns()
+        self.__tree = BlockTree()
+        self.__lock = RLock()
+        self.__chain_version = 0
+        self.__mempool_version = 0
+        self.state_id = uuid4().hex
+        self.__store = open_store(store, node_id, mapped)
         self.load_data()
 
+    @staticmethod
+    def genesis_block() -> Block:
+        """
+        Return the first block every chain starts with
+        """
+        # the genesis block keeps the legacy encoding so that
+        # its hash matches on every node of the network
+        return Block(0, "", [], 100, 0, LEGACY_VERSION)
+
+    @property
+    def resolve_conflicts(self) -> bool:
+        """
+        True if the node has to resolve conflicts
+        before mining again
+        """
+        return self.__resolve_conflicts
+
+    @resolve_conflicts.setter
+    def resolve_conflicts(self, value) -> None:
+        if value != self.__resolve_conflicts:
+            self.__resolve_conflicts = value
+            self.events.publish("conflict", {"resolve_conflicts": value})
+
     def get_chain(self) -> list:
         """
         Return a copy of the Blockchain, 
         chain is private and hence should 
         not be manipulated from outside, a 
         copy of which can be used for 
-        manipulations.
+        manipulations. A memory mapped chain
+        is returned as is, its blocks are
+        decoded on access.
         """
+        if self.mapped:
+            return self.__chain
         return self.__chain[:]
 
+    def stream_chain(self):
+        """
+        Yield the json encoding of every block of the
+        chain at the time of the call, a memory mapped
+        chain hands out the stored bytes without decoding
+        them and ends the stream early when its blocks
+        are rewritten meanwhile
+        """
+        if not self.mapped:
+            with self.__lock:
+                chain = self.__chain[:]
+            for block in chain:
+                yield MappedChain.encode(block).rstrip(b"\n")
+            return
+        with self.__lock:
+            length = len(self.__chain)
+            generation = self.__chain.generation
+        for start in range(0, length, STREAM_BATCH):
+            with self.__lock:
+                if self.__chain.generation != generation:
+                    # a reorganization or resolve replaced blocks, the
+                    # rest would not link to the blocks streamed so far
+                    return
+                batch = [
+                    self.__chain.raw(index)
+                    for index in range(start, min(start + STREAM_BATCH, length))
+                ]
+            for raw in batch:
+                yield raw.rstrip(b"\n")
+
+    def stream_open_transactions(self):
+        """
+        Yield the json encoding of every open transaction
+        """
+        for tx in self.get_open_transactions():
+            yield json.dumps(tx.__dict__).encode("utf-8")
+
+    def get_chain_length(self) -> int:
+        """
+        Return the number of blocks in the chain
+        """
+        return len(self.__chain)
+
     def get_open_transactions(self) -> list:
         """
         Return a copy of the open_transactions, 
@@ -61,86 +196,107 @@ class Blockchain:
         """
         Load stored data from disk 
         """
-        try:
-            with open(f"blockchain-{self.node_id}.txt", mode="r") as file:
-                file_content = file.readlines()
-                blockchain = json.loads(file_content[0][:-1])
-                updated_blockchain = []
-                for block in blockchain:
-                    converted_tx = [
-                        Transaction(
-                            tx["sender"], tx["recipient"], tx["signature"], tx["amount"]
-                        )
-                        for tx in block["transactions"]
-                    ]
-                    updated_block = Block(
-                        block["index"],
-                        block["previous_hash"],
-                        converted_tx,
-                        block["proof"],
-                        block["timestamp"],
-                    )
-                    updated_blockchain.append(updated_block)
-                self.__chain = updated_blockchain
-
-                self.__open_transactions = json.loads(file_content[1][:-1])
-                updated_transactions: list = []
-                for tx in self.__open_transactions:
-                    updated_transaction = Transaction(
-                        tx["sender"], tx["recipient"], tx["signature"], tx["amount"]
-                    )
-                    updated_transactions.append(updated_transaction)
-                self.__open_transactions = updated_transactions
-                peer_nodes = json.loads(file_content[2])
-                self.__peer_nodes = set(peer_nodes)
-        except (IOError, IndexError):
-            pass
+        chain, open_transactions, peer_nodes = self.__store.load()
+        self.__checkpoint = self.__store.load_checkpoint()
+        if not self.mapped and len(chain or []) <= 1:
+            chain = self.__unmap(chain, open_transactions, peer_nodes)
+        if chain is None:
+            # a new store starts out with the genesis block
+            self.__store.save(self.__chain, [], [])
+        elif chain:
+            if not self.mapped:
+                self.__chain = chain
+            elif len(self.__chain) <= 1 and len(chain) > 1:
+                # a text file chain is moved into the mapped file once
+                self.__chain.replace(chain)
+        self.__columns.reset(self.__chain, self.__checkpoint)
+        self.__tree.reset(self.__chain)
+        self.__open_transactions = open_transactions
+        for node in peer_nodes:
+            self.__peers.add(node)
+        self.__prune()
+
+    def __unmap(self, chain, open_transactions, peer_nodes) -> list:
+        """
+        Move the chain of an earlier run with a memory mapped
+        file back into the store, the text file of such a run
+        holds no blocks. Returns the chain to start from.
+
+        Args:
+            chain : the chain found in the store
+            open_transactions : the open transactions found in the store
+            peer_nodes : the peer nodes found in the store
+        """
+        path = f"blockchain-{self.node_id}.dat"
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return chain
+        if not os.path.exists(path + ".idx"):
+            # opening the file without its index would drop its blocks
+            MappedChain.rebuild_index(path)
+        mapped_chain = MappedChain(path)
+        if len(mapped_chain) <= len(chain or []):
+            mapped_chain.close()
+            return chain
+        chain = list(mapped_chain)
+        # the store is written before the mapped file is removed,
+        # a crash in between moves the chain again on the next start
+        self.__store.save(chain, open_transactions, peer_nodes)
+        mapped_chain.remove()
+        return chain
 
     def save_data(self) -> None:
         """
         Save blockchain data on disk
         """
-        try:
-            with open(f"blockchain-{self.node_id}.txt", mode="w") as file:
-                saveable_chain = [
-                    block.__dict__
-                    for block in [
-                        Block(
-                            block_el.index,
-                            block_el.previous_hash,
-                            [tx.__dict__ for tx in block_el.transactions],
-                            block_el.proof,
-                            block_el.timestamp,
-                        )
-                        for block_el in self.__chain
-                    ]
-                ]
-                file.write(json.dumps(saveable_chain))
-                file.write("\n")
-                saveable_tx = [tx.__dict__.copy() for tx in self.__open_transactions]
-                file.write(json.dumps(saveable_tx))
-                file.write("\n")
-                file.write(json.dumps(list(self.__peer_nodes)))
-        except IOError:
-            print("Saving Failed!")
+        self.__store.save(
+            self.__chain, self.__open_transactions, self.__peers.hosts()
+        )
+
+    def prune_chain(self) -> Checkpoint:
+        """
+        Prune all blocks more than `prune` blocks deep right
+        away, without waiting for enough of them to pile up.
+        Returns the checkpoint of the chain or None
+        """
+        with self.__lock:
+            self.__prune(interval=1)
+            return self.__checkpoint
+
+    def close(self) -> None:
+        """
+        Release the files the blockchain is stored in
+        """
+        with self.__lock:
+            self.__store.close()
+            if self.mapped:
+                self.__chain.close()
 
-    def proof_of_work(self) -> int:
+    def proof_of_work(self, transactions=None) -> int:
         """
         Generate a proof of work for the open transactions,
         the hash of the previous block and a random number
         (which is guessed until it fits)
+
+        Args:
+            transactions : the transactions to mine
+                        (default = the open transactions)
         """
+        if transactions is None:
+            transactions = self.__open_transactions
         last_block = self.__chain[-1]
         last_hash = hash_block(last_block)
+        hasher = Verification.proof_hasher(transactions, last_hash)
         proof = 0
 
-        while not Verification.valid_proof(self.__open_transactions, last_hash, proof):
+        while not Verification.solves(hasher, proof):
             proof += 1
         return proof
 
     def get_balance(self, sender=None) -> float:
         """
-        Calculate and return the balance for a participant
+        Calculate and return the balance for a participant,
+        mined transactions are summed up from the columnar
+        export so that the chain itself is not scanned
         """
         if sender == None:
             if self.public_key == None:
@@ -148,33 +304,22 @@ class Blockchain:
             participant = self.public_key
         else:
             participant = sender
-        tx_sender = [
-            [tx.amount for tx in block.transactions if tx.sender == participant]
-            for block in self.__chain
-        ]
         open_tx_sender = [
             tx.amount for tx in self.__open_transactions if tx.sender == participant
         ]
-        tx_sender.append(open_tx_sender)
-        amount_sent = reduce(
-            lambda tx_sum, tx_amt: tx_sum + sum(tx_amt)
-            if len(tx_amt) > 0
-            else tx_sum + 0,
-            tx_sender,
-            0,
-        )
-        tx_recipient = [
-            [tx.amount for tx in block.transactions if tx.recipient == participant]
-            for block in self.__chain
-        ]
-        amount_received = reduce(
-            lambda tx_sum, tx_amt: tx_sum + sum(tx_amt)
-            if len(tx_amt) > 0
-            else tx_sum + 0,
-            tx_recipient,
-            0,
-        )
-        return amount_received - amount_sent
+        amount_sent = reduce(lambda tx_sum, tx_amt: tx_sum + tx_amt, open_tx_sender, 0)
+        return self.__columns.balance(participant) - amount_sent
+
+    def get_analytics(self, top=10, bucket=3600.0) -> dict:
+        """
+        Return aggregate figures over all mined
+        transactions of the chain
+
+        Args:
+            top: number of top senders
+            bucket: width of a volume bucket in seconds
+        """
+        return self.__columns.summary(top, bucket)
 
     def get_last_blockchain_value(self) -> Any:
         """
@@ -185,7 +330,13 @@ class Blockchain:
         return self.__chain[-1]
 
     def add_transaction(
-        self, recipient: str, sender, signature, amount: float = 1.0, is_receiving=False
+        self,
+        recipient: str,
+        sender,
+        signature,
+        amount: float = 1.0,
+        is_receiving=False,
+        scheme=SCHEME_RSA,
     ) -> bool:
         """
         Append a new value as well as the last blockchain value to
@@ -196,114 +347,588 @@ class Blockchain:
             recipient : recipient of the coins
             amount : the amount of coins sent with the trasaction
                         (default = 1.0)
+            scheme : signature scheme of the sender's keys
         """
-        if self.public_key == None:
+        if self.public_key == None and not self.multi_tenant:
             return False
-        transaction = Transaction(sender, recipient, signature, amount)
-        if Verification.verify_transaction(transaction, self.get_balance):
+        transaction = Transaction(sender, recipient, signature, amount, scheme)
+        # the funds check and the append happen under the lock the
+        # ingestion committer and mining take, so that concurrent
+        # transactions can not spend the same funds twice
+        with self.__lock:
+            if not Verification.verify_transaction(transaction, self.get_balance):
+                return False
             self.__open_transactions.append(transaction)
-            self.save_data()
-            if not is_receiving:
-                for node in self.__peer_nodes:
-                    url = f"http://{node}/broadcast-transaction"
-                    try:
-                        response = requests.post(
-                            url,
-                            json={
-                                "sender": sender,
-                                "recipient": recipient,
-                                "amount": amount,
-                                "signature": signature,
-                            },
+            self.__mempool_version += 1
+            self.events.publish(
+                "mempool", {"added": [transaction.__dict__], "removed": []}
+            )
+            self.__store.add_transaction(
+                transaction,
+                self.__chain,
+                self.__open_transactions,
+                self.__peers.hosts(),
+            )
+        if not is_receiving:
+            responses = self.__peers.broadcast(
+                "/broadcast-transaction",
+                {
+                    "sender": sender,
+                    "recipient": recipient,
+                    "amount": amount,
+                    "signature": signature,
+                    "scheme": scheme,
+                },
+            )
+            for _, response in responses:
+                if response.status_code == 400 or response.status_code == 500:
+                    print("Transaction Declined, Needs Resolving!")
+                    return False
+        return True
+
+    def commit_transactions(self, transactions) -> list:
+        """
+        Add transactions whose signatures were already
+        verified, e.g. by the ingestion workers, and store
+        them at once. Returns whether each one was added.
+
+        Args:
+            transactions : the verified transactions
+        """
+        if self.public_key == None and not self.multi_tenant:
+            return [False] * len(transactions)
+        results = []
+        with self.__lock:
+            added = []
+            # a transaction reaches a node once from every peer
+            # that relays it, only the first one is added
+            signatures = {tx.signature for tx in self.__open_transactions}
+            for transaction in transactions:
+                # the funds are checked in order, so the open
+                # transactions added before count against them
+                try:
+                    success = (
+                        transaction.signature not in signatures
+                        and Verification.verify_transaction(
+                            transaction, self.get_balance, check_signature=False
                         )
-                        if response.status_code == 400 or response.status_code == 500:
-                            print("Transaction Declined, Needs Resolving!")
-                            return False
-                    except requests.exceptions.ConnectionError:
-                        continue
-            return True
-        return False
+                    )
+                except (TypeError, ValueError):
+                    # only this transaction is rejected, the ones
+                    # added before it are still stored below
+                    success = False
+                if success:
+                    self.__open_transactions.append(transaction)
+                    signatures.add(transaction.signature)
+                    added.append(transaction)
+                results.append(success)
+            if added:
+                self.__mempool_version += 1
+                self.events.publish(
+                    "mempool", {"added": [tx.__dict__ for tx in added], "removed": []}
+                )
+                self.__store.add_transactions(
+                    added,
+                    self.__chain,
+                    self.__open_transactions,
+                    self.__peers.hosts(),
+                )
+        return results
 
-    def mine_block(self) -> bool:
+    def mine_block(self, miner=None) -> bool:
         """
         Create a new block and add open transactions 
         to it
+
+        Args:
+            miner : public key the reward is paid to
+                        (default = public key of the node)
         """
-        if self.public_key == None:
+        miner = self.public_key if miner is None else miner
+        if miner == None:
             return None
 
         last_block = self.__chain[-1]
         hashed_block = hash_block(last_block)
 
-        proof = self.proof_of_work()
-        reward_transaction = Transaction("MINING", self.public_key, "", MINING_REWARD)
-
+        # transactions committed while mining wait for the next block
         copied_transactions = self.__open_transactions[:]
+        proof = self.proof_of_work(copied_transactions)
+        reward_transaction = Transaction("MINING", miner, "", MINING_REWARD)
+
         for tx in copied_transactions:
             if not Wallet.verify_transaction(tx):
                 return None
         copied_transactions.append(reward_transaction)
-        block = Block(len(self.__chain), hashed_block, copied_transactions, proof)
-
-        self.__chain.append(block)
-        self.__open_transactions = []
-        self.save_data()
-        for node in self.__peer_nodes:
-            url = f"http://{node}/broadcast-block"
-            converted_block = block.__dict__.copy()
-            converted_block["transactions"] = [
-                tx.__dict__ for tx in converted_block["transactions"]
-            ]
-            try:
-                response = requests.post(url, json={"block": converted_block})
-                if response.status_code == 400 or response.status_code == 500:
-                    print("Block Declined, Needs Resolving!")
-                if response.status_code == 409:
+        with self.__lock:
+            # a peer's block may have moved the tip while mining
+            if hash_block(self.__chain[-1]) != hashed_block:
+                return None
+            block = Block(len(self.__chain), hashed_block, copied_transactions, proof)
+            mempool = self.__open_transactions
+            self.__append_block(block)
+            self.__open_transactions = self.__without_mined(
+                self.__open_transactions, copied_transactions
+            )
+            self.__chain_version += 1
+            self.__mempool_changed(mempool)
+            self.__store.add_block(
+                block, self.__chain, self.__open_transactions, self.__peers.hosts()
+            )
+            self.__prune()
+        converted_block = block.__dict__.copy()
+        converted_block["transactions"] = [
+            tx.__dict__ for tx in converted_block["transactions"]
+        ]
+        responses = self.__peers.broadcast(
+            "/broadcast-block", {"block": converted_block}
+        )
+        for node, response in responses:
+            if response.status_code == 400 or response.status_code == 500:
+                print("Block Declined, Needs Resolving!")
+            if response.status_code == 409:
+                # the peer is ahead, pull its branch instead of
+                # waiting for a full resolve
+                try:
+                    tip_hash = response.json()["tip"]
+                except (ValueError, KeyError):
+                    tip_hash = None
+                if tip_hash is None or not self.fetch_ancestors(tip_hash, [node]):
                     self.resolve_conflicts = True
-            except requests.exceptions.ConnectionError:
-                continue
         return block
 
-    def add_block(self, block):
+    def add_block(self, block) -> str:
         """
-        Add a new block to the Blockchain
+        Offer a block received from a peer to the Blockchain,
+        it either extends the tip, is kept on a side branch
+        (switching to that branch once it is the longest),
+        or is buffered as an orphan until its parent arrives.
+        Returns one of the BLOCK_* outcomes.
 
         Args:
             block : the block to add
         """
-        transactions = [
-            Transaction(tx["sender"], tx["recipeint"], tx["signature", tx["amount"]])
-            for tx in block["transactions"]
+        try:
+            converted_block = Block.from_dict(block)
+        except (KeyError, TypeError, ValueError):
+            return BLOCK_INVALID
+        with self.__lock:
+            mempool = self.__open_transactions[:]
+            status = self.__add_block(converted_block)
+            # children which were waiting for this block can follow
+            pending = [hash_block(converted_block)] if status != BLOCK_INVALID else []
+            while pending:
+                for child_hash, child in self.__tree.take_orphans(pending.pop()):
+                    child_status = self.__add_block(child, child_hash)
+                    if child_status == BLOCK_REORG or (
+                        child_status == BLOCK_ADDED and status != BLOCK_REORG
+                    ):
+                        status = child_status
+                    if child_status not in (BLOCK_INVALID, BLOCK_ORPHAN):
+                        pending.append(child_hash)
+            if status not in (BLOCK_INVALID, BLOCK_KNOWN):
+                self.__chain_version += 1
+                self.__mempool_changed(mempool)
+            if status in (BLOCK_ADDED, BLOCK_REORG):
+                self.__prune()
+            return status
+
+    def receive_block(self, block) -> str:
+        """
+        Offer a block broadcast by a peer, missing ancestors
+        of an orphan are requested from the peers. Returns
+        one of the BLOCK_* outcomes.
+
+        Args:
+            block : the block to add
+        """
+        status = self.add_block(block)
+        if status != BLOCK_ORPHAN:
+            return status
+        self.fetch_ancestors(block["previous_hash"])
+        block_hash = hash_block(Block.from_dict(block))
+        with self.__lock:
+            if self.__tree.active_index(block_hash) is not None:
+                return BLOCK_ADDED
+            if self.__tree.contains(block_hash):
+                return BLOCK_SIDE
+        return BLOCK_ORPHAN
+
+    def __add_block(self, block, block_hash=None) -> str:
+        """
+        Place a single block in the block tree
+
+        Args:
+            block : the converted block
+            block_hash : hash of the block, computed if missing
+        """
+        block_hash = hash_block(block) if block_hash is None else block_hash
+        if self.__tree.is_known(block_hash):
+            return BLOCK_KNOWN
+        if not Verification.valid_proof(
+            block.transactions[:-1], block.previous_hash, block.proof, block.version
+        ):
+            return BLOCK_INVALID
+        if self.__checkpoint is not None and block.index <= self.__checkpoint.index:
+            # the chain up to the checkpoint can not be switched anymore
+            return BLOCK_INVALID
+        parent_height = self.__tree.height(block.previous_hash)
+        if parent_height is None:
+            self.__tree.add_orphan(block, block_hash)
+            return BLOCK_ORPHAN
+        if block.index != parent_height + 1:
+            return BLOCK_INVALID
+        if self.__tree.active_index(block.previous_hash) == len(self.__chain) - 1:
+            if not Verification.verify_block_transactions(
+                block, self.__columns.balance, {}
+            ):
+                return BLOCK_INVALID
+            self.__append_block(block, block_hash)
+            self.__remove_open_transactions(block.transactions)
+            self.__store.add_block(
+                block, self.__chain, self.__open_transactions, self.__peers.hosts()
+            )
+            return BLOCK_ADDED
+        self.__tree.add_side(block, block_hash)
+        if block.index >= len(self.__chain):
+            return self.__reorganize(block_hash)
+        return BLOCK_SIDE
+
+    def __append_block(self, block, block_hash=None) -> None:
+        """
+        Append a block to the active chain and its indexes
+
+        Args:
+            block : the block to append
+            block_hash : hash of the block, computed if missing
+        """
+        block_hash = hash_block(block) if block_hash is None else block_hash
+        self.__chain.append(block)
+        self.__columns.append_block(block)
+        self.__tree.push_active(block, block_hash)
+        self.__tree.prune_side(block.index)
+        converted_block = block.__dict__.copy()
+        converted_block["transactions"] = [
+            tx.__dict__ for tx in converted_block["transactions"]
         ]
-        proof_is_valid = Verification.valid_proof(
-            transactions[:-1], block["previous_hash"], block["proof"]
+        converted_block["hash"] = block_hash
+        self.events.publish("block", converted_block)
+
+    def __reorganize(self, tip_hash) -> str:
+        """
+        Switch the active chain to the side branch ending
+        in a block, only the blocks after the fork are
+        undone and applied. Transactions of the abandoned
+        blocks go back to the open transactions. The branch
+        is checked in full before anything is changed.
+
+        Args:
+            tip_hash : hash of the last block of the branch
+        """
+        fork_index, branch = self.__tree.branch(tip_hash)
+        if fork_index is None:
+            return BLOCK_SIDE
+        if self.__checkpoint is not None and fork_index < self.__checkpoint.index:
+            return BLOCK_SIDE
+        invalid = self.__invalid_block(fork_index, branch)
+        if invalid is not None:
+            for block in branch[invalid:]:
+                self.__tree.discard_side(hash_block(block))
+            return BLOCK_INVALID
+        abandoned = self.__abandoned_transactions(fork_index)
+        for index in range(fork_index + 1, len(self.__chain)):
+            self.__tree.pop_active(self.__chain[index])
+        if self.mapped:
+            self.__chain.truncate(fork_index + 1)
+        else:
+            del self.__chain[fork_index + 1 :]
+        self.__columns.truncate(fork_index + 1)
+        self.events.publish("rollback", {"length": fork_index + 1})
+        self.__store.rollback(
+            fork_index + 1,
+            self.__chain,
+            self.__open_transactions,
+            self.__peers.hosts(),
         )
-        hashes_match = hash_block(self.chain[-1]) == block["previous_hash"]
-        if not proof_is_valid or not hashes_match:
-            return False
-        converted_block = Block(
-            block["index"],
-            block["previous_hash"],
-            transactions,
-            block["proof"],
-            block["timestamp"],
+        for block in branch:
+            self.__append_block(block)
+        self.__requeue(abandoned, branch)
+        self.__store.add_blocks(
+            branch, self.__chain, self.__open_transactions, self.__peers.hosts()
         )
-        self.__chain.append(converted_block)
-        stored_transactions = self.__open_transactions[:]
-        for itx in block["transactions"]:
-            for opentx in stored_transactions:
-                if (
-                    opentx.sender == itx["sender"]
-                    and opentx.recipient == itx["recipient"]
-                    and opentx.amount == itx["amount"]
-                    and opentx.signature == itx["signature"]
-                ):
+        return BLOCK_REORG
+
+    def __invalid_block(self, fork_index, branch) -> int:
+        """
+        Return the position of the first block of a branch
+        whose transactions are invalid, None if all are valid
+
+        Args:
+            fork_index : position of the last active block the branch shares
+            branch : the blocks after the fork
+        """
+        # undo the active blocks after the fork to get
+        # the balances the branch starts from
+        changes = {}
+        for index in range(fork_index + 1, len(self.__chain)):
+            for tx in self.__chain[index].transactions:
+                changes[tx.sender] = changes.get(tx.sender, 0.0) + tx.amount
+                changes[tx.recipient] = changes.get(tx.recipient, 0.0) - tx.amount
+        for position, block in enumerate(branch):
+            if not Verification.verify_block_transactions(
+                block, self.__columns.balance, changes
+            ):
+                return position
+        return None
+
+    def __abandoned_transactions(self, fork_index) -> list:
+        """
+        Return the transfers of the active blocks after a fork
+
+        Args:
+            fork_index : position of the last block which is kept
+        """
+        return [
+            tx
+            for index in range(fork_index + 1, len(self.__chain))
+            for tx in self.__chain[index].transactions
+            if tx.sender != "MINING"
+        ]
+
+    def __requeue(self, abandoned, branch) -> None:
+        """
+        Keep the abandoned and open transactions which
+        are still valid on top of a newly applied branch
+
+        Args:
+            abandoned : transfers of the blocks which were undone
+            branch : the blocks which were applied
+        """
+        candidates = abandoned + self.__open_transactions
+        self.__open_transactions = []
+        for block in branch:
+            candidates = self.__without_mined(candidates, block.transactions)
+        for tx in candidates:
+            if Verification.verify_transaction(tx, self.get_balance):
+                self.__open_transactions.append(tx)
+
+    def __prune(self, interval=PRUNE_INTERVAL) -> None:
+        """
+        Drop the transactions of all blocks more than `prune`
+        blocks deep once enough of them piled up, the balances
+        up to the last pruned block are kept in a checkpoint
+
+        Args:
+            interval : number of prunable blocks to wait for
+        """
+        if self.prune is None:
+            return
+        index = len(self.__chain) - 1 - self.prune
+        pruned = 0 if self.__checkpoint is None else self.__checkpoint.index
+        if index - pruned < interval:
+            return
+        checkpoint = Checkpoint(
+            index, hash_block(self.__chain[index]), self.__columns.fold(index + 1)
+        )
+        if self.mapped:
+            # the checkpoint is stored first, a crash in between
+            # leaves blocks which are pruned again on the next start
+            self.__store.prune(
+                checkpoint,
+                self.__chain,
+                self.__open_transactions,
+                self.__peers.hosts(),
+            )
+            self.__checkpoint = checkpoint
+            self.__prune_bodies(pruned + 1)
+        else:
+            self.__checkpoint = checkpoint
+            self.__prune_bodies(pruned + 1)
+            self.__store.prune(
+                checkpoint,
+                self.__chain,
+                self.__open_transactions,
+                self.__peers.hosts(),
+            )
+        self.__chain_version += 1
+        self.events.publish("prune", {"index": index})
+
+    def __prune_bodies(self, start=1) -> None:
+        """
+        Replace the blocks up to the checkpoint by their
+        headers, blocks of the legacy encoding are kept
+        as their hash covers the transactions themselves
+
+        Args:
+            start : index of the first block which may still be whole
+        """
+        index = self.__checkpoint.index
+
+        def prunable(block):
+            return (
+                start <= block.index <= index
+                and block.version != LEGACY_VERSION
+                and getattr(block, "tx_digest", None) is None
+            )
+
+        if self.mapped:
+            self.__chain.replace(
+                PrunedBlock.of(block) if prunable(block) else block
+                for block in self.__chain
+            )
+            return
+        for position in range(max(start, 0), index + 1):
+            block = self.__chain[position]
+            if prunable(block):
+                self.__chain[position] = PrunedBlock.of(block)
+
+    def __mempool_changed(self, previous) -> None:
+        """
+        Bump the mempool version and publish which open
+        transactions were added and removed
+
+        Args:
+            previous : the open transactions before the change
+        """
+        self.__mempool_version += 1
+        before = {tx.signature for tx in previous}
+        after = {tx.signature for tx in self.__open_transactions}
+        added = [
+            tx.__dict__
+            for tx in self.__open_transactions
+            if tx.signature not in before
+        ]
+        removed = list(before - after)
+        if added or removed:
+            self.events.publish("mempool", {"added": added, "removed": removed})
+
+    def __remove_open_transactions(self, transactions) -> None:
+        """
+        Drop open transactions which were mined into a block
+
+        Args:
+            transactions : the transactions of the block
+        """
+        self.__open_transactions = self.__without_mined(
+            self.__open_transactions, transactions
+        )
+
+    @staticmethod
+    def __without_mined(open_transactions, transactions) -> list:
+        """
+        Return the open transactions which are not part
+        of the mined transactions
+
+        Args:
+            open_transactions : the transactions to filter
+            transactions : the mined transactions
+        """
+        mined = {
+            (tx.sender, tx.recipient, tx.amount, tx.signature) for tx in transactions
+        }
+        return [
+            tx
+            for tx in open_transactions
+            if (tx.sender, tx.recipient, tx.amount, tx.signature) not in mined
+        ]
+
+    def has_block(self, block_hash) -> bool:
+        """
+        Return True if a block is on the active
+        chain or on a side branch
+
+        Args:
+            block_hash : hash of the block
+        """
+        return self.__tree.contains(block_hash)
+
+    def get_block(self, block_hash):
+        """
+        Return a block of the active chain or of
+        a side branch, None if it is unknown
+
+        Args:
+            block_hash : hash of the block
+        """
+        index = self.__tree.active_index(block_hash)
+        if index is not None:
+            return self.__chain[index]
+        return self.__tree.get_side(block_hash)
+
+    def get_tip_hash(self) -> str:
+        """
+        Return the hash of the last block
+        """
+        return hash_block(self.__chain[-1])
+
+    def get_chain_version(self) -> int:
+        """
+        Return a counter which changes whenever
+        a block is added, stored or switched to
+        """
+        return self.__chain_version
+
+    def get_mempool_version(self) -> int:
+        """
+        Return a counter which changes whenever
+        the open transactions change
+        """
+        return self.__mempool_version
+
+    def get_peers_version(self) -> int:
+        """
+        Return a counter which changes whenever
+        a peer node or its health changes
+        """
+        return self.__peers.version
+
+    def get_checkpoint(self) -> Checkpoint:
+        """
+        Return the state of the chain up to the last
+        pruned block, None if nothing was pruned
+        """
+        return self.__checkpoint
+
+    def get_tree_stats(self) -> dict:
+        """
+        Return the number of active, side and orphan blocks
+        """
+        return self.__tree.stats()
+
+    def fetch_ancestors(self, block_hash, hosts=None) -> bool:
+        """
+        Download a missing block and, as long as it is an
+        orphan, its ancestors from peer nodes, return True
+        if the block got connected to the tree
+
+        Args:
+            block_hash : hash of the missing block
+            hosts : peers to ask (default = random healthy peers)
+        """
+        for _ in range(MAX_FETCH):
+            if self.has_block(block_hash):
+                return True
+            block = None
+            for node in hosts or self.__peers.sample():
+                response = self.__peers.request("GET", node, f"/block/{block_hash}")
+                if response is not None and response.status_code == 200:
                     try:
-                        self.__open_transactions.remove(opentx)
-                    except ValueError:
-                        print("Item was already removed!")
-        self.save_data()
-        return True
+                        block = response.json()["block"]
+                    except (ValueError, KeyError):
+                        continue
+                    if isinstance(block, dict) and "tx_digest" in block:
+                        # a pruning peer can not hand out the
+                        # transactions, ask the next peer instead
+                        block = None
+                        continue
+                    break
+            if block is None:
+                return False
+            status = self.add_block(block)
+            if status != BLOCK_ORPHAN:
+                return status != BLOCK_INVALID
+            block_hash = block["previous_hash"]
+        return False
 
     def resolve(self):
         """
@@ -311,48 +936,131 @@ class Blockchain:
         and give precedense to the longest 
         chain
         """
-        winner_chain = self.__chain
-        replace = False
-        for node in self.__peer_nodes:
-            url = f"http://{node}/chain"
-            try:
-                response = requests.get(url)
-                node_chain = response.json()
-                node_chain = [
-                    Block(
-                        block["index"],
-                        block["previous_hash"],
-                        [
-                            Transaction(
-                                tx["sender"],
-                                tx["recipient"],
-                                tx["signature"],
-                                tx["amount"],
-                            )
-                            for tx in block["transactions"]
-                        ],
-                        block["proof"],
-                        block["timestamp"],
-                    )
-                    for block in node_chain
-                ]
-                node_chain_length = len(node_chain)
-                local_chain_length = len(winner_chain)
-                if (
-                    node_chain_length > local_chain_length
-                    and Verification.verify_chain(node_chain)
-                ):
-                    winner_chain = node_chain
+        self.discover_peers()
+        with self.__lock:
+            replace = False
+            mempool = self.__open_transactions
+            # number of blocks the store shares with the adopted chain
+            stored_length = len(self.__chain)
+            for node in self.__peers.healthy():
+                response = self.__peers.request("GET", node, "/chain", stream=True)
+                if response is None:
+                    continue
+                if self.mapped:
+                    node_chain = MappedChain(f"blockchain-{self.node_id}.dat.incoming")
+                    node_chain.replace([])
+                else:
+                    node_chain = []
+                try:
+                    # peers announce the length of their chain, shorter
+                    # chains are skipped without downloading them
+                    node_chain_length = response.headers.get("X-Chain-Length")
+                    if node_chain_length is not None and int(node_chain_length) <= len(
+                        self.__chain
+                    ):
+                        continue
+                    # a pruning peer serves blocks without transactions up
+                    # to its checkpoint, only a node trusting the chain up
+                    # to there itself can verify them
+                    node_pruned = response.headers.get("X-Chain-Pruned")
+                    if node_pruned is not None and (
+                        self.__checkpoint is None
+                        or int(node_pruned) > self.__checkpoint.index
+                    ):
+                        continue
+
+                    def received_blocks():
+                        for block in iter_json_array(response.iter_content(CHUNK_SIZE)):
+                            converted_block = Block.from_dict(block)
+                            node_chain.append(converted_block)
+                            yield converted_block
+
+                    # blocks are verified while they are streamed in,
+                    # an invalid chain stops the download early
+                    if not (
+                        Verification.verify_chain(
+                            received_blocks(), self.__checkpoint
+                        )
+                        and len(node_chain) > len(self.__chain)
+                    ):
+                        continue
+                    if hash_block(node_chain[0]) != hash_block(self.__chain[0]):
+                        self.__peers.record_failure(node)
+                        continue
+                    # only the blocks after the fork have to be checked,
+                    # the ones before are shared with the active chain
+                    fork_index = self.__fork_index(node_chain)
+                    branch = [
+                        node_chain[index]
+                        for index in range(fork_index + 1, len(node_chain))
+                    ]
+                    if self.__invalid_block(fork_index, branch) is not None:
+                        self.__peers.record_failure(node)
+                        continue
+                    abandoned = self.__abandoned_transactions(fork_index)
+                    stored_length = min(stored_length, fork_index + 1)
+                    if self.mapped:
+                        self.__chain.replace(node_chain)
+                    else:
+                        self.__chain = node_chain
+                    if self.__checkpoint is not None:
+                        # the new chain passes through the checkpoint, its
+                        # blocks up to there are pruned like the old ones
+                        self.__prune_bodies()
+                    self.__columns.reset(self.__chain, self.__checkpoint)
+                    self.__tree.reset(self.__chain)
+                    self.__requeue(abandoned, branch)
                     replace = True
-            except requests.exceptions.ConnectionError:
-                continue
-        self.resolve_conflicts = False
-        self.__chain = winner_chain
-        if replace:
-            self.__open_transactions = []
-        self.save_data()
+                except (ValueError, KeyError, TypeError):
+                    self.__peers.record_failure(node)
+                    continue
+                finally:
+                    response.close()
+                    if self.mapped:
+                        node_chain.remove()
+            self.resolve_conflicts = False
+            if replace:
+                # only the blocks after the fork are written again
+                self.__store.rollback(
+                    stored_length,
+                    self.__chain,
+                    self.__open_transactions,
+                    self.__peers.hosts(),
+                )
+                self.__store.add_blocks(
+                    [
+                        self.__chain[index]
+                        for index in range(stored_length, len(self.__chain))
+                    ],
+                    self.__chain,
+                    self.__open_transactions,
+                    self.__peers.hosts(),
+                )
+                self.__prune()
+                self.__chain_version += 1
+                self.__mempool_changed(mempool)
+                self.events.publish("chain", {"length": len(self.__chain)})
         return replace
 
+    def __fork_index(self, chain) -> int:
+        """
+        Return the position of the last block a chain which
+        starts with the same genesis block shares with the
+        active chain, a shared block means all blocks before
+        it are shared too
+
+        Args:
+            chain : the chain to compare
+        """
+        low, high = 0, min(len(chain), len(self.__chain)) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.__tree.active_index(hash_block(chain[middle])) == middle:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
     def add_peer_node(self, node):
         """
         Add a new node to the peer node set.
@@ -360,8 +1068,9 @@ class Blockchain:
         Args:
             node: The node URL which should be added.
         """
-        self.__peer_nodes.add(node)
-        self.save_data()
+        if self.__peers.add(node):
+            self.events.publish("peers", {"all_nodes": self.__peers.hosts()})
+        self.save_peers()
 
     def remove_peer_node(self, node):
         """
@@ -370,11 +1079,37 @@ class Blockchain:
         Args:
             node: The node URL which should be removed.
         """
-        self.__peer_nodes.discard(node)
-        self.save_data()
+        self.__peers.discard(node)
+        self.events.publish("peers", {"all_nodes": self.__peers.hosts()})
+        self.save_peers()
 
     def get_peer_nodes(self):
         """
         Return a list of all connected peer nodes.
         """
-        return list(self.__peer_nodes)
+        return self.__peers.hosts()
+
+    def save_peers(self):
+        """
+        Store the current peer nodes.
+        """
+        self.__store.save_peers(
+            self.__chain, self.__open_transactions, self.__peers.hosts()
+        )
+
+    def get_peer_stats(self):
+        """
+        Return the health of all connected peer nodes.
+        """
+        return self.__peers.stats()
+
+    def discover_peers(self):
+        """
+        Learn new peer nodes from the peers of a
+        random subset of the connected peer nodes.
+        """
+        learned = self.__peers.exchange()
+        if learned:
+            self.events.publish("peers", {"all_nodes": self.__peers.hosts()})
+            self.save_peers()
+        return learned
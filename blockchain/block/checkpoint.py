@@ -0,0 +1,30 @@
+from utility.printable import Printable
+
+
+class Checkpoint(Printable):
+    """
+    Represent the state of the chain up to a block
+    whose history was pruned, blocks up to it are
+    trusted instead of being replayed
+
+    Attributes:
+        index     : index of the last pruned block
+        block_hash: hash of that block
+        balances  : balance of every address after that block
+    """
+    def __init__(self, index, block_hash, balances) -> None:
+        self.index = index
+        self.block_hash = block_hash
+        self.balances = balances
+
+    @staticmethod
+    def from_dict(checkpoint) -> "Checkpoint":
+        """
+        Return the checkpoint for its dictionary form
+
+        Args:
+            checkpoint: the checkpoint as parsed from json
+        """
+        return Checkpoint(
+            checkpoint["index"], checkpoint["block_hash"], checkpoint["balances"]
+        )
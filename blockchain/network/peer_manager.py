@@ -0,0 +1,272 @@
+import re
+import random
+import socket
+import requests
+from time import time
+from threading import Lock
+from typing import Any
+
+from utility.printable import Printable
+
+
+# Initialize the networking limits
+BROADCAST_FANOUT: int = 8
+REQUEST_TIMEOUT: float = 5.0
+BACKOFF_BASE: float = 2.0
+BACKOFF_MAX: float = 300.0
+LATENCY_WEIGHT: float = 0.3
+MAX_PEERS: int = 64
+
+# Initialize the form of a peer's address, host:port
+HOST_PATTERN = re.compile(r"^[A-Za-z0-9.-]{1,253}:[0-9]{1,5}$")
+
+
+def valid_host(host) -> bool:
+    """
+    Return True if a peer address is a host:port string
+
+    Args:
+        host: the address to check
+    """
+    if not isinstance(host, str) or not HOST_PATTERN.match(host):
+        return False
+    return 0 < int(host.rsplit(":", 1)[1]) < 65536
+
+
+def local_hosts(port) -> set:
+    """
+    Return the addresses a node on this machine can
+    be reached at, so that it never learns itself as peer
+
+    Args:
+        port: port of the node
+    """
+    names = {"localhost", "127.0.0.1", "0.0.0.0"}
+    try:
+        hostname = socket.gethostname()
+        names.update({hostname, socket.getfqdn()})
+        names.update(socket.gethostbyname_ex(hostname)[2])
+    except OSError:
+        pass
+    try:
+        # connecting a udp socket sends nothing, it only
+        # picks the address of the outgoing interface
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.connect(("10.255.255.255", 1))
+            names.add(probe.getsockname()[0])
+    except OSError:
+        pass
+    return {f"{name}:{port}" for name in names}
+
+
+class Peer(Printable):
+    """
+    Represent the health of a single peer node
+
+    Attributes:
+        host         : host:port of the peer
+        latency      : moving average of the response time in seconds
+        failures     : consecutive failed requests
+        last_seen    : timestamp of the last successful request
+        backoff_until: timestamp before which the peer is skipped
+    """
+    def __init__(self, host) -> None:
+        self.host = host
+        self.latency = None
+        self.failures = 0
+        self.last_seen = None
+        self.backoff_until = 0.0
+
+    def is_healthy(self, now=None) -> bool:
+        """
+        Return True if the peer is not backed off
+        """
+        return (time() if now is None else now) >= self.backoff_until
+
+
+class PeerManager:
+    """
+    Keep track of peer nodes and their health,
+    and talk to them over http
+
+    Attributes:
+        peers  : peers keyed by host(private)
+        exclude: hosts which are never added, e.g. the node itself
+        fanout : number of peers a broadcast is sent to
+        version: counter bumped whenever a peer or its health changes
+    """
+
+    def __init__(self, hosts=(), exclude=(), fanout=BROADCAST_FANOUT) -> None:
+        self.__peers = {}
+        self.__lock = Lock()
+        self.exclude = set(exclude)
+        self.fanout = fanout
+        self.version = 0
+        for host in hosts:
+            self.add(host)
+
+    def add(self, host) -> bool:
+        """
+        Add a peer, return True if it was not known before
+
+        Args:
+            host: host:port of the peer
+        """
+        if not valid_host(host) or host in self.exclude:
+            return False
+        with self.__lock:
+            if host in self.__peers:
+                return False
+            self.__peers[host] = Peer(host)
+            self.version += 1
+            return True
+
+    def discard(self, host) -> None:
+        """
+        Forget about a peer
+
+        Args:
+            host: host:port of the peer
+        """
+        with self.__lock:
+            if self.__peers.pop(host, None) is not None:
+                self.version += 1
+
+    def hosts(self) -> list:
+        """
+        Return the hosts of all known peers
+        """
+        with self.__lock:
+            return list(self.__peers)
+
+    def healthy(self) -> list:
+        """
+        Return the hosts of all peers which are not
+        backed off, fastest peers first
+        """
+        now = time()
+        with self.__lock:
+            peers = [peer for peer in self.__peers.values() if peer.is_healthy(now)]
+        peers.sort(key=lambda peer: float("inf") if peer.latency is None else peer.latency)
+        return [peer.host for peer in peers]
+
+    def sample(self, k=None) -> list:
+        """
+        Return a random subset of the healthy peers
+
+        Args:
+            k: size of the subset (default = fanout)
+        """
+        healthy = self.healthy()
+        k = self.fanout if k is None else k
+        if len(healthy) <= k:
+            return healthy
+        return random.sample(healthy, k)
+
+    def stats(self) -> list:
+        """
+        Return the health of all known peers
+        """
+        with self.__lock:
+            return [peer.__dict__.copy() for peer in self.__peers.values()]
+
+    def record_success(self, host, latency) -> None:
+        """
+        Update a peer after a successful request
+
+        Args:
+            host: host:port of the peer
+            latency: response time in seconds
+        """
+        with self.__lock:
+            peer = self.__peers.get(host)
+            if peer is None:
+                return
+            if peer.latency is None:
+                peer.latency = latency
+            else:
+                peer.latency += LATENCY_WEIGHT * (latency - peer.latency)
+            peer.failures = 0
+            peer.last_seen = time()
+            peer.backoff_until = 0.0
+            self.version += 1
+
+    def record_failure(self, host) -> None:
+        """
+        Update a peer after a failed request and back
+        off from it exponentially
+
+        Args:
+            host: host:port of the peer
+        """
+        with self.__lock:
+            peer = self.__peers.get(host)
+            if peer is None:
+                return
+            peer.failures += 1
+            backoff = min(BACKOFF_BASE ** peer.failures, BACKOFF_MAX)
+            peer.backoff_until = time() + backoff
+            self.version += 1
+
+    def request(self, method, host, path, **kwargs) -> Any:
+        """
+        Send a request to a peer and record its health,
+        return the response or None if the peer is unreachable
+
+        Args:
+            method: http method e.g. "GET"
+            host: host:port of the peer
+            path: path of the route e.g. "/chain"
+        """
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        start = time()
+        try:
+            response = requests.request(method, f"http://{host}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            self.record_failure(host)
+            return None
+        self.record_success(host, time() - start)
+        return response
+
+    def broadcast(self, path, payload) -> list:
+        """
+        Post a payload to a random subset of the healthy
+        peers, return (host, response) pairs of the peers
+        that answered
+
+        Args:
+            path: path of the route e.g. "/broadcast-block"
+            payload: json payload to post
+        """
+        responses = []
+        for host in self.sample():
+            response = self.request("POST", host, path, json=payload)
+            if response is not None:
+                responses.append((host, response))
+        return responses
+
+    def exchange(self) -> list:
+        """
+        Ask a random subset of the healthy peers for
+        their peers (GET /nodes) and add the unknown
+        ones up to MAX_PEERS, return the newly learned hosts
+        """
+        learned = []
+        for host in self.sample():
+            response = self.request("GET", host, "/nodes")
+            if response is None or response.status_code != 200:
+                continue
+            try:
+                nodes = response.json()["all_nodes"]
+            except (ValueError, KeyError, TypeError):
+                self.record_failure(host)
+                continue
+            if not isinstance(nodes, list):
+                self.record_failure(host)
+                continue
+            for node in nodes:
+                if len(self.__peers) >= MAX_PEERS:
+                    return learned
+                if self.add(node):
+                    learned.append(node)
+        return learned
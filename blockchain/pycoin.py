@@ -1,13 +1,327 @@
+import json
+import math
 from flask_cors import CORS
-from flask import Flask, jsonify
-from flask import request, send_from_directory
+from flask import Flask, Response, jsonify
+from flask import request, send_from_directory, stream_with_context
 from argparse import ArgumentParser
 
 from transact.wallet import Wallet
+from transact.keystore import Keystore
+from transact.ingestion import TransactionIngestor
+from transact.transaction import SCHEME_ED25519, SCHEME_RSA
 from block.blockchain import Blockchain
+from network.peer_manager import valid_host
+from analytics.columns import MIN_BUCKET
+from block.block_tree import (
+    BLOCK_ADDED,
+    BLOCK_KNOWN,
+    BLOCK_ORPHAN,
+    BLOCK_REORG,
+    BLOCK_SIDE,
+)
+from utility.json_stream import gzip_chunks, json_array_chunks
+from utility.response_cache import ResponseCache
+from utility.event_bus import KEEPALIVE, EventBus
 
 app = Flask(__name__)
 CORS(app)
+cache = ResponseCache()
+events = EventBus()
+
+
+def not_modified(etag):
+    """
+    Return a `304` response if the client already
+    holds the representation with an entity tag,
+    None otherwise
+
+    Args:
+        etag: entity tag of the current representation
+    """
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached_json(route, key, build):
+    """
+    Return a json response which is only built once
+    per state, clients sending a matching
+    `If-None-Match` get a `304` instead
+
+    Args:
+        route: name of the route
+        key: tuple describing the state the response depends on
+        build: function returning the response data
+    """
+    etag = cache.etag(route, key)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    body = cache.get(route, key)
+    if body is None:
+        body = cache.put(route, key, json.dumps(build()).encode("utf-8"))
+    response = Response(body, status=200, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def stream_json_array(items, headers=None, route=None, key=None):
+    """
+    Return a response streaming a json array,
+    gzip compressed if the client accepts it. With
+    a route and a state key the response is tagged
+    and clients holding it get a `304` instead
+
+    Args:
+        items: json encoded elements of the array (bytes)
+        headers: additional response headers
+        route: name of the route
+        key: tuple describing the state the response depends on
+    """
+    headers = dict(headers or {})
+    compress = "gzip" in request.accept_encodings
+    etag = None
+    if route is not None:
+        etag = cache.etag(route, key + (compress,))
+        response = not_modified(etag)
+        if response is not None:
+            return response
+    chunks = json_array_chunks(items)
+    if compress:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    response = Response(
+        stream_with_context(chunks),
+        status=200,
+        mimetype="application/json",
+        headers=headers,
+    )
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def use_wallet():
+    """
+    Switch the node over to the keys of the wallet, the
+    chain is kept and only the key mining rewards are
+    paid to changes, so that no second instance holds
+    the files of the node
+    """
+    blockchain.public_key = wallet.public_key
+    if not multi_tenant:
+        events.publish("reset", {"public_key": wallet.public_key})
+
+
+def pruned_index():
+    """
+    Return the index of the last block whose transactions
+    the node dropped, None if it keeps all of them
+    """
+    checkpoint = blockchain.get_checkpoint()
+    return None if checkpoint is None else checkpoint.index
+
+
+def pruned_headers():
+    """
+    Return the header telling peers up to which block the
+    node serves pruned blocks, which a node without the same
+    checkpoint can not verify
+    """
+    index = pruned_index()
+    return {} if index is None else {"X-Chain-Pruned": str(index)}
+
+
+def balance_response(public_key, route="balance"):
+    """
+    Return the balance of a public key, built once
+    per chain tip and mempool version
+
+    Args:
+        public_key: key of the participant
+        route: name of the route the response is cached for
+    """
+    key = (
+        blockchain.state_id,
+        public_key,
+        blockchain.get_tip_hash(),
+        blockchain.get_mempool_version(),
+    )
+    return cached_json(
+        route,
+        key,
+        lambda: {
+            "message": "Fetched Balance Successfully",
+            "funds": blockchain.get_balance(public_key),
+        },
+    )
+
+
+def send_transaction(sender):
+    """
+    Sign and add a transaction of a wallet,
+    e.g. `{"recipient": ..., "amount": ...}`
+
+    Args:
+        sender: wallet the coins are sent from
+    """
+    values = request.get_json()
+    if not values:
+        response = {"message": "No Data Found!"}
+        return jsonify(response), 400
+    required_fields = ["recipient", "amount"]
+    if not all(field in values for field in required_fields):
+        response = {"message": "Required Data is missing."}
+        return jsonify(response), 400
+    recipient = values["recipient"]
+    amount = values["amount"]
+    signature = sender.sign_transaction(sender.public_key, recipient, amount)
+    success = blockchain.add_transaction(
+        recipient, sender.public_key, signature, amount, scheme=sender.key_type
+    )
+    if success:
+        response = {
+            "message": "Successfully added transaction.",
+            "transaction": {
+                "sender": sender.public_key,
+                "recipient": recipient,
+                "amount": amount,
+                "signature": signature,
+                "scheme": sender.key_type,
+            },
+            "funds": blockchain.get_balance(sender.public_key),
+        }
+        return jsonify(response), 201
+    else:
+        response = {"message": "Creating a transaction failed"}
+        return jsonify(response), 500
+
+
+def send_transactions(sender):
+    """
+    Sign and add several transactions of a wallet,
+    e.g. `{"transactions": [{"recipient": ..., "amount": ...}]}`
+
+    Args:
+        sender: wallet the coins are sent from
+    """
+    values = request.get_json()
+    if not values or not isinstance(values.get("transactions"), list):
+        response = {"message": "No Data Found!"}
+        return jsonify(response), 400
+    required_fields = ["recipient", "amount"]
+    if not all(
+        isinstance(tx, dict) and all(field in tx for field in required_fields)
+        for tx in values["transactions"]
+    ):
+        response = {"message": "Required Data is missing."}
+        return jsonify(response), 400
+    payments = [
+        (sender.public_key, tx["recipient"], tx["amount"])
+        for tx in values["transactions"]
+    ]
+    signatures = sender.sign_many(payments)
+    results = []
+    for (public_key, recipient, amount), signature in zip(payments, signatures):
+        success = blockchain.add_transaction(
+            recipient, public_key, signature, amount, scheme=sender.key_type
+        )
+        results.append(
+            {
+                "success": success,
+                "transaction": {
+                    "sender": public_key,
+                    "recipient": recipient,
+                    "amount": amount,
+                    "signature": signature,
+                    "scheme": sender.key_type,
+                },
+            }
+        )
+    added = sum(result["success"] for result in results)
+    response = {
+        "message": f"Added {added} of {len(results)} transactions.",
+        "results": results,
+        "funds": blockchain.get_balance(sender.public_key),
+    }
+    return jsonify(response), 201 if added == len(results) else 207
+
+
+def mine_for(public_key):
+    """
+    Mine a block paying the reward to a public key
+
+    Args:
+        public_key: key the mining reward is paid to
+    """
+    if blockchain.resolve_conflicts:
+        response = {"message": "Resolve conflicts first, block not added."}
+        return jsonify(response), 409
+    block = blockchain.mine_block(public_key)
+    if block != None:
+        dict_block = block.__dict__.copy()
+        dict_block["transactions"] = [tx.__dict__ for tx in dict_block["transactions"]]
+        response = {
+            "message": "Block added successfully",
+            "block": dict_block,
+            "funds": blockchain.get_balance(public_key),
+        }
+        return jsonify(response), 201
+    else:
+        response = {
+            "message": "Adding a block failed",
+            "wallet_set_up": public_key != None,
+        }
+        return jsonify(response), 500
+
+
+def commit_received(transactions):
+    """
+    Add transactions received from peers, once
+    their signatures were verified, to the chain
+    the node currently runs
+
+    Args:
+        transactions: the verified transactions
+    """
+    return blockchain.commit_transactions(transactions)
+
+
+def hosted_wallet(wallet_id):
+    """
+    Return (wallet, None) for a wallet managed by
+    the node or (None, error response) otherwise
+
+    Args:
+        wallet_id: id of the wallet
+    """
+    if keystore is None:
+        response = {"message": "The node does not host wallets."}
+        return None, (jsonify(response), 400)
+    tenant = keystore.authenticate(wallet_id, wallet_secret())
+    if tenant is None:
+        # unknown wallets and wrong secrets look the same
+        response = {"message": "Wallet not found or secret invalid."}
+        return None, (jsonify(response), 401, {"WWW-Authenticate": "Bearer"})
+    return tenant, None
+
+
+def wallet_secret():
+    """
+    Return the secret of a hosted wallet sent as
+    `Authorization: Bearer <secret>`, None if missing
+    """
+    scheme, _, secret = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secret.strip():
+        return None
+    return secret.strip()
 
 
 @app.route("/", methods=["GET"])
@@ -33,18 +347,25 @@ def get_network_ui():
 @app.route("/wallet", methods=["POST"])
 def create_keys():
     """
-    Route to create keys
+    Route to create keys, the signature scheme
+    can be picked with `{"key_type": "ed25519"}`
 
     Request: `POST`
     """
+    values = request.get_json(silent=True) or {}
+    key_type = values.get("key_type", wallet.key_type)
+    if key_type not in (SCHEME_RSA, SCHEME_ED25519):
+        response = {"message": "Unknown key type."}
+        return jsonify(response), 400
+    wallet.key_type = key_type
     wallet.create_keys()
     wallet.save_keys()
     if wallet.save_keys():
-        global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        use_wallet()
         response = {
             "public_key": wallet.public_key,
             "private_key": wallet.private_key,
+            "key_type": wallet.key_type,
             "funds": blockchain.get_balance(),
         }
         return jsonify(response), 201
@@ -61,11 +382,11 @@ def load_keys():
     Request: `GET`
     """
     if wallet.load_keys():
-        global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        use_wallet()
         response = {
             "public_key": wallet.public_key,
             "private_key": wallet.private_key,
+            "key_type": wallet.key_type,
             "funds": blockchain.get_balance(),
         }
         return jsonify(response), 201
@@ -74,6 +395,132 @@ def load_keys():
     return jsonify(response), 500
 
 
+@app.route("/wallets", methods=["POST"])
+def create_hosted_keys():
+    """
+    Route to create a wallet hosted by a multi-tenant
+    node, the signature scheme can be picked with
+    `{"key_type": "ed25519"}`. The returned secret has
+    to be sent as `Authorization: Bearer <secret>` to
+    use the wallet, the node does not keep it.
+
+    Request: `POST`
+    """
+    if keystore is None:
+        response = {"message": "The node does not host wallets."}
+        return jsonify(response), 400
+    values = request.get_json(silent=True) or {}
+    key_type = values.get("key_type", wallet.key_type)
+    if key_type not in (SCHEME_RSA, SCHEME_ED25519):
+        response = {"message": "Unknown key type."}
+        return jsonify(response), 400
+    wallet_id, tenant, secret = keystore.create(key_type)
+    if tenant is None:
+        response = {"message": "Saving the keys failed"}
+        return jsonify(response), 500
+    response = {
+        "wallet_id": wallet_id,
+        "secret": secret,
+        "public_key": tenant.public_key,
+        "private_key": tenant.private_key,
+        "key_type": tenant.key_type,
+        "funds": blockchain.get_balance(tenant.public_key),
+    }
+    return jsonify(response), 201
+
+
+@app.route("/wallets", methods=["GET"])
+def get_hosted_wallets():
+    """
+    Route to look up the hosted wallet a secret
+    unlocks, the wallets of other users are not listed
+
+    Request: `GET`
+    """
+    if keystore is None:
+        response = {"message": "The node does not host wallets."}
+        return jsonify(response), 400
+    wallet_id = keystore.find(wallet_secret())
+    if wallet_id is None:
+        response = {"message": "Wallet not found or secret invalid."}
+        return jsonify(response), 401, {"WWW-Authenticate": "Bearer"}
+    tenant = keystore.authenticate(wallet_id, wallet_secret())
+    wallets = [
+        {
+            "wallet_id": wallet_id,
+            "public_key": tenant.public_key,
+            "key_type": tenant.key_type,
+            "funds": blockchain.get_balance(tenant.public_key),
+        }
+    ]
+    return jsonify({"wallets": wallets}), 200
+
+
+@app.route("/wallets/<wallet_id>/balance", methods=["GET"])
+def get_hosted_balance(wallet_id):
+    """
+    Route to get the coin balance of a hosted wallet
+
+    Args:
+        wallet_id: id of the wallet
+
+    Request: `GET`
+    """
+    tenant, error = hosted_wallet(wallet_id)
+    if error is not None:
+        return error
+    return balance_response(tenant.public_key, f"balance-{wallet_id}")
+
+
+@app.route("/wallets/<wallet_id>/transaction", methods=["POST"])
+def add_hosted_transaction(wallet_id):
+    """
+    Route to add a transaction of a hosted wallet
+
+    Args:
+        wallet_id: id of the wallet
+
+    Request: `POST`
+    """
+    tenant, error = hosted_wallet(wallet_id)
+    if error is not None:
+        return error
+    return send_transaction(tenant)
+
+
+@app.route("/wallets/<wallet_id>/transaction/batch", methods=["POST"])
+def add_hosted_transactions(wallet_id):
+    """
+    Route to add several transactions of a hosted wallet
+
+    Args:
+        wallet_id: id of the wallet
+
+    Request: `POST`
+    """
+    tenant, error = hosted_wallet(wallet_id)
+    if error is not None:
+        return error
+    return send_transactions(tenant)
+
+
+@app.route("/wallets/<wallet_id>/mine", methods=["POST"])
+def hosted_mine(wallet_id):
+    """
+    Route to mine a block paying the reward
+    to a hosted wallet
+
+    Args:
+        wallet_id: id of the wallet
+
+    Request: `POST`
+    """
+    tenant, error = hosted_wallet(wallet_id)
+    if error is not None:
+        return error
+    return mine_for(tenant.public_key)
+
+
 @app.route("/balance", methods=["GET"])
 def get_balance():
     """
@@ -81,10 +528,8 @@ def get_balance():
 
     Request: `GET`
     """
-    balance = blockchain.get_balance()
-    if balance != None:
-        response = {"message": "Fetched Balance Successfully", "funds": balance}
-        return jsonify(response), 200
+    if blockchain.public_key != None:
+        return balance_response(blockchain.public_key)
     else:
         response = {
             "message": "Loading balance failed",
@@ -97,7 +542,8 @@ def get_balance():
 def broadcast_transaction():
     """
     Route to broadcast transactions to
-    peer nodes
+    peer nodes, the transaction is queued
+    and validated in the background
 
     Request: `POST`
     """
@@ -109,27 +555,39 @@ def broadcast_transaction():
     if not all(key in values for key in required):
         response = {"message": "Some Data is Missing."}
         return jsonify(response), 400
-    success = blockchain.add_transaction(
-        values["recipient"],
-        values["sender"],
-        values["signature"],
-        values["amount"],
-        is_receiving=True,
-    )
-    if success:
-        response = {
-            "message": "Successfully added transaction.",
-            "transaction": {
-                "sender": values["sender"],
-                "recipient": values["recipient"],
-                "amount": values["amount"],
-                "signature": values["signature"],
-            },
-        }
-        return jsonify(response), 201
-    else:
+    if blockchain.public_key == None and not blockchain.multi_tenant:
         response = {"message": "Creating a transaction failed"}
         return jsonify(response), 500
+    if not ingestor.submit(values):
+        # the sender should slow down and try again later
+        response = {
+            "message": "Too many transactions, try again later.",
+            "queue_depth": ingestor.depth(),
+        }
+        return jsonify(response), 503, {"Retry-After": "1"}
+    response = {
+        "message": "Transaction queued.",
+        "transaction": {
+            "sender": values["sender"],
+            "recipient": values["recipient"],
+            "amount": values["amount"],
+            "signature": values["signature"],
+            "scheme": values.get("scheme", SCHEME_RSA),
+        },
+        "queue_depth": ingestor.depth(),
+    }
+    return jsonify(response), 202
+
+
+@app.route("/ingest", methods=["GET"])
+def get_ingest_stats():
+    """
+    Route to get the queue depths and the drop
+    counts of the transaction ingestion
+
+    Request: `GET`
+    """
+    return jsonify(ingestor.stats()), 200
 
 
 @app.route("/broadcast-block", methods=["POST"])
@@ -148,20 +606,49 @@ def broadcast_block():
         response = {"message": "Some Data is Missing."}
         return jsonify(response), 400
     block = values["block"]
-    if block["index"] == blockchain.chain[-1].index + 1:
-        if blockchain.add_block(block):
-            response = {"message": "Block Added"}
-            return jsonify(response), 201
-        else:
-            response = {"message": "Block seems invalid."}
-            return jsonify(response), 500
-    elif block["index"] > blockchain.chain[-1].index:
+    status = blockchain.receive_block(block)
+    if status in (BLOCK_ADDED, BLOCK_REORG):
+        response = {"message": "Block Added"}
+        return jsonify(response), 201
+    elif status == BLOCK_KNOWN:
+        response = {"message": "Block already known"}
+        return jsonify(response), 200
+    elif status == BLOCK_ORPHAN:
         response = {"message": "Blockchain seems to be shorter, block not added."}
         blockchain.resolve_conflicts = True
         return jsonify(response), 200
-    else:
-        response = {"message": "Blockchain seems to be shorter, block not added"}
+    elif status == BLOCK_SIDE and block["index"] < blockchain.get_chain_length() - 1:
+        response = {
+            "message": "Blockchain seems to be shorter, block not added",
+            "tip": blockchain.get_tip_hash(),
+        }
         return jsonify(response), 409
+    elif status == BLOCK_SIDE:
+        response = {"message": "Block stored on a side branch"}
+        return jsonify(response), 200
+    else:
+        response = {"message": "Block seems invalid."}
+        return jsonify(response), 500
+
+
+@app.route("/block/<block_hash>", methods=["GET"])
+def get_block(block_hash):
+    """
+    Route to get a single block of the
+    active chain or of a side branch
+
+    Args:
+        block_hash: hash of the block
+
+    Request = `GET`
+    """
+    block = blockchain.get_block(block_hash)
+    if block is None:
+        response = {"message": "Block not found"}
+        return jsonify(response), 404
+    dict_block = block.__dict__.copy()
+    dict_block["transactions"] = [tx.__dict__ for tx in dict_block["transactions"]]
+    return jsonify({"block": dict_block}), 200, pruned_headers()
 
 
 @app.route("/transaction", methods=["POST"])
@@ -174,33 +661,21 @@ def add_transaction():
     if wallet.public_key == None:
         response = {"message": "No Wallet set up"}
         return jsonify(response), 400
-    values = request.get_json()
-    if not values:
-        response = {"message": "No Data Found!"}
-        return jsonify(response), 400
-    required_fields = ["recipient", "amount"]
-    if not all(field in values for field in required_fields):
-        response = {"message": "Required Data is missing."}
+    return send_transaction(wallet)
+
+
+@app.route("/transaction/batch", methods=["POST"])
+def add_transactions():
+    """
+    Route to add several transactions at once,
+    e.g. `{"transactions": [{"recipient": ..., "amount": ...}]}`
+
+    Request: `POST`
+    """
+    if wallet.public_key == None:
+        response = {"message": "No Wallet set up"}
         return jsonify(response), 400
-    recipient = values["recipient"]
-    amount = values["amount"]
-    signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
-    success = blockchain.add_transaction(recipient, wallet.public_key, signature, amount)
-    if success:
-        response = {
-            "message": "Successfully added transaction.",
-            "transaction": {
-                "sender": wallet.public_key,
-                "recipient": recipient,
-                "amount": amount,
-                "signature": signature,
-            },
-            "funds": blockchain.get_balance(),
-        }
-        return jsonify(response), 201
-    else:
-        response = {"message": "Creating a transaction failed"}
-        return jsonify(response), 500
+    return send_transactions(wallet)
 
 
 @app.route("/mine", methods=["POST"])
@@ -210,25 +685,7 @@ def mine():
 
     Request: `POST`
     """
-    if blockchain.resolve_conflicts:
-        response = {"message": "Resolve conflicts first, block not added."}
-        return jsonify(response), 409
-    block = blockchain.mine_block()
-    if block != None:
-        dict_block = block.__dict__.copy()
-        dict_block["transactions"] = [tx.__dict__ for tx in dict_block["transactions"]]
-        response = {
-            "message": "Block added successfully",
-            "block": dict_block,
-            "funds": blockchain.get_balance(),
-        }
-        return jsonify(response), 201
-    else:
-        response = {
-            "message": "Adding a block failed",
-            "wallet_set_up": wallet.public_key != None,
-        }
-        return jsonify(response), 500
+    return mine_for(blockchain.public_key)
 
 
 @app.route("/resolve-conflicts", methods=["POST"])
@@ -250,27 +707,101 @@ def resolve_conflicts():
 @app.route("/transactions", methods=["GET"])
 def get_open_transactions():
     """
-    Route to get all open_transactions
+    Route to get all open_transactions,
+    streamed one transaction at a time
 
     Request = `GET`
     """
-    transactions = blockchain.get_open_transactions()
-    dict_transactions = [tx.__dict__ for tx in transactions]
-    return jsonify(dict_transactions), 200
+    return stream_json_array(
+        blockchain.stream_open_transactions(),
+        route="transactions",
+        key=(blockchain.state_id, blockchain.get_mempool_version()),
+    )
 
 
 @app.route("/chain", methods=["GET"])
 def get_chain():
     """
-    Route to get a snapshot of a chain
+    Route to get a snapshot of a chain,
+    streamed one block at a time
 
     Request = `GET`
     """
-    chain_snapshot = blockchain.get_chain()
-    dict_chain = [block.__dict__.copy() for block in chain_snapshot]
-    for dict_block in dict_chain:
-        dict_block["transactions"] = [tx.__dict__ for tx in dict_block["transactions"]]
-    return jsonify(dict_chain), 200
+    return stream_json_array(
+        blockchain.stream_chain(),
+        dict(pruned_headers(), **{"X-Chain-Length": str(blockchain.get_chain_length())}),
+        route="chain",
+        key=(
+            blockchain.state_id,
+            blockchain.get_tip_hash(),
+            blockchain.get_chain_version(),
+        ),
+    )
+
+
+@app.route("/events", methods=["GET"])
+def get_events():
+    """
+    Route to follow the changes of the node as
+    server-sent events: `block` (a new block with
+    its transactions), `rollback` and `chain` (the
+    chain was cut or replaced), `mempool` (added and
+    removed open transactions), `prune` (blocks up to
+    an index lost their transactions), `peers`,
+    `conflict` and `reset` (the state has to be reloaded).
+    Reconnecting clients continue after their
+    `Last-Event-ID`.
+
+    Request = `GET`
+    """
+    last_id = request.headers.get("Last-Event-ID", request.args.get("after"))
+    try:
+        last_id = events.last_id if last_id is None else int(last_id)
+    except ValueError:
+        response = {"message": "Invalid event id."}
+        return jsonify(response), 400
+
+    def stream(event_id):
+        # browsers reconnect after 3 seconds if the stream breaks
+        yield b"retry: 3000\n\n"
+        while True:
+            batch = events.since(event_id, KEEPALIVE)
+            if batch is None:
+                # the client missed events, it has to reload everything
+                event_id = events.last_id
+                yield events.encode(event_id, "reset", {})
+            elif not batch:
+                yield b": keepalive\n\n"
+            for event_id, data in batch or ():
+                yield data
+
+    return Response(
+        stream_with_context(stream(last_id)),
+        status=200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/analytics", methods=["GET"])
+def get_analytics():
+    """
+    Route to get aggregate figures of
+    the chain, e.g. `/analytics?top=5&bucket=60`
+
+    Request = `GET`
+    """
+    try:
+        top = int(request.args.get("top", 10))
+        bucket = float(request.args.get("bucket", 3600.0))
+    except ValueError:
+        response = {"message": "Invalid query parameters."}
+        return jsonify(response), 400
+    # nan and inf would end up in the response, which is no valid json
+    if top < 0 or not math.isfinite(bucket) or bucket < MIN_BUCKET:
+        response = {"message": "Invalid query parameters."}
+        return jsonify(response), 400
+    return jsonify(blockchain.get_analytics(top, bucket)), 200
 
 
 @app.route("/node", methods=["POST"])
@@ -290,6 +821,9 @@ def add_node():
         return jsonify(response), 400
 
     node = values["node"]
+    if not valid_host(node):
+        response = {"message": "A node has to be given as host:port"}
+        return jsonify(response), 400
     blockchain.add_peer_node(node)
     response = {
         "message": "Node Added Successfully",
@@ -325,17 +859,85 @@ def get_nodes():
 
     Request = `GET` 
     """
-    nodes = blockchain.get_peer_nodes()
-    response = {"all_nodes": nodes}
+    key = (
+        blockchain.state_id,
+        blockchain.get_peers_version(),
+        blockchain.get_chain_version(),
+    )
+    return cached_json(
+        "nodes",
+        key,
+        lambda: {
+            "all_nodes": blockchain.get_peer_nodes(),
+            "peers": blockchain.get_peer_stats(),
+            "blocks": blockchain.get_tree_stats(),
+            "pruned": pruned_index(),
+        },
+    )
+
+
+@app.route("/nodes/discover", methods=["POST"])
+def discover_nodes():
+    """
+    Route to learn new peer nodes from
+    the connected peer nodes
+
+    Request = `POST`
+    """
+    learned = blockchain.discover_peers()
+    response = {
+        "message": f"Learned {len(learned)} new Nodes",
+        "all_nodes": blockchain.get_peer_nodes(),
+    }
     return jsonify(response), 200
 
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("-p", "--port", type=int, default=5000)
+    parser.add_argument(
+        "--mmap", action="store_true", help="keep the chain in a memory mapped file"
+    )
+    parser.add_argument(
+        "--store",
+        choices=["text", "sqlite"],
+        default="text",
+        help="where the node is persisted",
+    )
+    parser.add_argument(
+        "--multi-tenant",
+        action="store_true",
+        help="host many wallets on the chain of the node",
+    )
+    parser.add_argument(
+        "--prune",
+        type=int,
+        metavar="N",
+        help="drop the transactions of blocks more than N blocks deep, the "
+        "node then can not serve the pruned blocks and new nodes have to "
+        "sync from a node keeping all blocks",
+    )
+    parser.add_argument(
+        "--key-type",
+        choices=[SCHEME_RSA, SCHEME_ED25519],
+        default=SCHEME_RSA,
+        help="signature scheme of newly created wallets",
+    )
     args = parser.parse_args()
+    if args.mmap and args.store == "sqlite":
+        parser.error("--mmap can only be used with the text store")
+    if args.prune is not None and args.prune < 1:
+        parser.error("--prune has to keep at least one block")
     port = args.port
-    wallet = Wallet(port)
-    blockchain = Blockchain(wallet.public_key, port)
+    mapped = args.mmap
+    store = args.store
+    multi_tenant = args.multi_tenant
+    prune = args.prune
+    wallet = Wallet(port, args.key_type)
+    keystore = Keystore(port) if multi_tenant else None
+    ingestor = TransactionIngestor(commit_received)
+    blockchain = Blockchain(
+        wallet.public_key, port, mapped, store, events, multi_tenant, prune
+    )
     """Launch the Blockchain App on localhost:5000"""
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,364 @@
+import os
+import sys
+from time import perf_counter
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from block.block import Block
+from block.checkpoint import Checkpoint
+from block.blockchain import Blockchain
+from transact.wallet import Wallet
+from storage.store import TextStore, open_store
+from storage.mapped_chain import MappedChain
+from storage.sqlite_store import SqliteStore
+from utility.hash_util import hash_block
+from utility.verification import Verification
+from utility.json_stream import CHUNK_SIZE, iter_json_array
+
+
+# Initialize the size of the work handed to a verify process
+SEGMENT_SIZE: int = 256
+SIGNATURE_BATCH: int = 256
+
+
+def verify_segment(previous_block, blocks, checkpoint) -> int:
+    """
+    Verify the hash links and proofs of a run of blocks,
+    return the index of the first invalid block or None
+
+    Args:
+        previous_block: the block before the run
+        blocks: the blocks to verify
+        checkpoint: state of the chain up to a pruned block
+    """
+    for block in blocks:
+        if not Verification.verify_block(previous_block, block, checkpoint):
+            return block.index
+        previous_block = block
+    return None
+
+
+def verify_signatures(transactions) -> list:
+    """
+    Verify the signatures of a batch of transactions,
+    return the block indexes of the invalid ones
+
+    Args:
+        transactions: (block index, transaction) pairs
+    """
+    return [
+        block_index
+        for block_index, tx in transactions
+        if not Wallet.verify_transaction(tx)
+    ]
+
+
+def chunks(items, size):
+    """
+    Yield consecutive slices of a list
+
+    Args:
+        items: the list to split
+        size: length of a slice
+    """
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def verify_chain(chain, checkpoint=None, workers=None) -> tuple:
+    """
+    Verify a chain with several processes, hash links
+    and proofs in segments and signatures in batches,
+    then replay its balances and mining rewards.
+    Returns (valid, figures) where figures holds
+    (step, items, seconds) of every step.
+
+    Args:
+        chain: the blocks of the chain, genesis first
+        checkpoint: state of the chain up to a pruned block
+        workers: number of processes (default = number of cpus)
+    """
+    figures = []
+    if not chain:
+        return False, figures
+    if hash_block(chain[0]) != hash_block(Blockchain.genesis_block()):
+        print("The chain does not start with the genesis block")
+        return False, figures
+    if checkpoint is not None and len(chain) <= checkpoint.index:
+        print(f"The chain ends before the checkpoint at block {checkpoint.index}")
+        return False, figures
+    with ProcessPoolExecutor(workers) as pool:
+        start = perf_counter()
+        segments = list(chunks(chain[1:], SEGMENT_SIZE))
+        previous_blocks = [chain[0]] + [segment[-1] for segment in segments[:-1]]
+        invalid_blocks = [
+            index
+            for index in pool.map(
+                verify_segment,
+                previous_blocks,
+                segments,
+                [checkpoint] * len(segments),
+            )
+            if index is not None
+        ]
+        figures.append(("links and proofs", len(chain) - 1, perf_counter() - start))
+        if invalid_blocks:
+            print(f"Block {min(invalid_blocks)} is not linked or mined correctly")
+            return False, figures
+
+        start = perf_counter()
+        transactions = [
+            (block.index, tx)
+            for block in chain
+            for tx in block.transactions
+            if tx.sender != "MINING"
+        ]
+        invalid_signatures = [
+            index
+            for indexes in pool.map(
+                verify_signatures, chunks(transactions, SIGNATURE_BATCH)
+            )
+            for index in indexes
+        ]
+        figures.append(("signatures", len(transactions), perf_counter() - start))
+        if invalid_signatures:
+            print(f"Block {min(invalid_signatures)} holds an invalid signature")
+            return False, figures
+
+    # balances depend on every block before, they are replayed in order
+    start = perf_counter()
+    invalid_block = Verification.first_invalid_transactions(
+        chain, checkpoint, check_signatures=False
+    )
+    figures.append(("balances", len(transactions), perf_counter() - start))
+    if invalid_block is not None:
+        print(f"Block {invalid_block} holds an unfunded transfer or a wrong reward")
+        return False, figures
+    return True, figures
+
+
+def print_figures(figures) -> None:
+    """
+    Print a table with the throughput of every step
+
+    Args:
+        figures: (step, items, seconds) of every step
+    """
+    print(f"{'step':<20}{'items':>10}{'seconds':>10}{'per second':>12}")
+    for step, items, seconds in figures:
+        rate = items / seconds if seconds > 0 else float("inf")
+        print(f"{step:<20}{items:>10}{seconds:>10.2f}{rate:>12.0f}")
+
+
+def node_files(port) -> list:
+    """
+    Return the files a node stores its chain in
+
+    Args:
+        port: port of the node
+    """
+    prefix = f"blockchain-{port}."
+    return sorted(name for name in os.listdir(".") if name.startswith(prefix))
+
+
+def storage_size(port) -> int:
+    """
+    Return the bytes taken by the files of a node
+
+    Args:
+        port: port of the node
+    """
+    return sum(os.path.getsize(name) for name in node_files(port))
+
+
+def load_node(port, store, mapped) -> tuple:
+    """
+    Return (chain, checkpoint, store) of a node
+
+    Args:
+        port: port of the node
+        store: "text" or "sqlite"
+        mapped: the chain lives in a memory mapped file
+    """
+    chain_store = open_store(store, port, mapped)
+    if mapped:
+        chain = list(MappedChain(f"blockchain-{port}.dat"))
+    else:
+        chain, _, _ = chain_store.load()
+    return chain or [], chain_store.load_checkpoint(), chain_store
+
+
+def read_chain(path) -> list:
+    """
+    Read a chain exported from another node, either
+    the output of `GET /chain` or a node's text file
+
+    Args:
+        path: path of the file
+    """
+    def file_chunks():
+        with open(path, "rb") as file:
+            while True:
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    return [Block.from_dict(block) for block in iter_json_array(file_chunks())]
+
+
+def read_checkpoint(path) -> Checkpoint:
+    """
+    Return the checkpoint a pruned node keeps in its
+    text file, None for any other export
+
+    Args:
+        path: path of the file
+    """
+    return TextStore(path).load_checkpoint()
+
+
+def run_verify(args) -> bool:
+    start = perf_counter()
+    chain, checkpoint, chain_store = load_node(args.port, args.store, args.mmap)
+    chain_store.close()
+    figures = [("load", len(chain), perf_counter() - start)]
+    valid, verify_figures = verify_chain(chain, checkpoint, args.workers)
+    print_figures(figures + verify_figures)
+    print(f"blockchain-{args.port}: {'valid' if valid else 'INVALID'}")
+    return valid
+
+
+def run_import(args) -> bool:
+    start = perf_counter()
+    try:
+        chain = read_chain(args.source)
+        source_checkpoint = read_checkpoint(args.source)
+    except (IOError, ValueError, KeyError, TypeError) as error:
+        print(f"Reading {args.source} failed: {error}")
+        return False
+    figures = [("read", len(chain), perf_counter() - start)]
+    current, checkpoint, chain_store = load_node(args.port, args.store, args.mmap)
+    if source_checkpoint is not None:
+        # the blocks up to it are pruned, only the checkpoint vouches for them
+        checkpoint = source_checkpoint
+    valid, verify_figures = verify_chain(chain, checkpoint, args.workers)
+    figures.extend(verify_figures)
+    if not valid:
+        print_figures(figures)
+        print(f"{args.source} is invalid, nothing imported")
+        chain_store.close()
+        return False
+    if len(chain) <= len(current) and not args.force:
+        print_figures(figures)
+        print(
+            f"{args.source} holds {len(chain)} blocks, the node already has "
+            f"{len(current)}, use --force to replace it anyway"
+        )
+        chain_store.close()
+        return False
+    start = perf_counter()
+    _, open_transactions, peer_nodes = chain_store.load()
+    if args.mmap:
+        mapped_chain = MappedChain(f"blockchain-{args.port}.dat")
+        mapped_chain.replace(chain)
+        mapped_chain.close()
+    # open transactions can not be checked against the new
+    # chain offline, the node starts with an empty mempool
+    chain_store.save(chain, [], peer_nodes)
+    if source_checkpoint is not None:
+        chain_store.prune(source_checkpoint, chain, [], peer_nodes)
+    chain_store.close()
+    figures.append(("write", len(chain), perf_counter() - start))
+    print_figures(figures)
+    print(
+        f"Imported {len(chain)} blocks into blockchain-{args.port}, "
+        f"dropped {len(open_transactions)} open transactions"
+    )
+    return True
+
+
+def run_reindex(args) -> bool:
+    start = perf_counter()
+    if args.mmap:
+        # the index has to be rebuilt before the chain is opened
+        blocks = MappedChain.rebuild_index(f"blockchain-{args.port}.dat")
+    elif args.store == "sqlite":
+        chain_store = SqliteStore(f"blockchain-{args.port}.db")
+        blocks = chain_store.reindex()
+        chain_store.close()
+    else:
+        print("The text store keeps no indexes, they are built when the node starts")
+        return True
+    print_figures([("reindex", blocks, perf_counter() - start)])
+    return True
+
+
+def run_compact(args) -> bool:
+    size = storage_size(args.port)
+    start = perf_counter()
+    if args.prune is not None:
+        # prune everything but the last N blocks, not only once
+        # enough prunable blocks piled up as a running node does
+        blockchain = Blockchain(None, args.port, args.mmap, args.store, prune=args.prune)
+        blockchain.prune_chain()
+        blockchain.close()
+    chain, checkpoint, chain_store = load_node(args.port, args.store, args.mmap)
+    if args.store == "sqlite":
+        chain_store.compact()
+    elif args.mmap:
+        mapped_chain = MappedChain(f"blockchain-{args.port}.dat")
+        mapped_chain.replace(chain)
+        mapped_chain.close()
+    else:
+        _, open_transactions, peer_nodes = chain_store.load()
+        chain_store.save(chain, open_transactions, peer_nodes)
+    chain_store.close()
+    print_figures([("compact", len(chain), perf_counter() - start)])
+    pruned = "nothing" if checkpoint is None else f"up to block {checkpoint.index}"
+    print(
+        f"blockchain-{args.port}: {size} -> {storage_size(args.port)} bytes, "
+        f"pruned {pruned}"
+    )
+    return True
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Verify, import, reindex or compact the chain of a "
+        "node while the node is not running"
+    )
+    parser.add_argument("-p", "--port", type=int, default=5000)
+    parser.add_argument("--store", choices=["text", "sqlite"], default="text")
+    parser.add_argument(
+        "--mmap", action="store_true", help="the chain lives in a memory mapped file"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, help="number of processes (default = cpus)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("verify", help="verify links, proofs and signatures")
+    import_parser = commands.add_parser("import", help="import an exported chain")
+    import_parser.add_argument("source", help="output of GET /chain or a node's text file")
+    import_parser.add_argument(
+        "--force", action="store_true", help="replace a longer chain of the node"
+    )
+    commands.add_parser("reindex", help="rebuild the indexes of the store")
+    compact_parser = commands.add_parser("compact", help="rewrite the store compactly")
+    compact_parser.add_argument(
+        "--prune",
+        type=int,
+        metavar="N",
+        help="drop the transactions of blocks more than N blocks deep, new "
+        "nodes can not sync the pruned blocks from the node anymore",
+    )
+    args = parser.parse_args()
+    if args.mmap and args.store == "sqlite":
+        parser.error("--mmap can only be used with the text store")
+    run = {
+        "verify": run_verify,
+        "import": run_import,
+        "reindex": run_reindex,
+        "compact": run_compact,
+    }[args.command]
+    sys.exit(0 if run(args) else 1)
@@ -0,0 +1,265 @@
+import os
+import json
+import mmap
+from array import array
+from threading import RLock
+from typing import Any
+
+from block.block import Block
+
+
+class MappedChain:
+    """
+    Sequence of blocks kept in a memory mapped file,
+    blocks are only decoded when they are accessed
+
+    The data file holds one json encoded block per line,
+    the index file holds the byte offset of every block
+    as unsigned 64 bit integers.
+
+    Attributes:
+        path      : path of the data file
+        offsets   : byte offset of every block(private)
+        map       : memory map of the data file(private)
+        generation: counter bumped whenever stored blocks are
+                    dropped or rewritten, appends keep it
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        self.__lock = RLock()
+        self.__offsets = array("Q")
+        self.__map = None
+        self.__mapped_size = 0
+        self.__tip = None
+        self.generation = 0
+        for file_path in (self.path, self.index_path):
+            if not os.path.exists(file_path):
+                open(file_path, "wb").close()
+        with open(self.index_path, "rb") as file:
+            self.__offsets.frombytes(file.read())
+        self.__end = 0
+        self.__repair()
+
+    def __repair(self) -> None:
+        """
+        Drop blocks which were only partially written,
+        e.g. after a crash between the two file writes
+        """
+        self.__remap()
+        end = 0
+        while len(self.__offsets):
+            start = self.__offsets[-1]
+            newline = -1
+            if start < self.__mapped_size:
+                newline = self.__map.find(b"\n", start)
+            if newline != -1:
+                end = newline + 1
+                break
+            self.__offsets.pop()
+        if end != self.__mapped_size:
+            self.close()
+            with open(self.path, "r+b") as file:
+                file.truncate(end)
+        self.__end = end
+        with open(self.index_path, "wb") as file:
+            file.write(self.__offsets.tobytes())
+
+    def __remap(self) -> None:
+        """
+        Map the data file again once it grew past
+        the currently mapped size
+        """
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        size = os.path.getsize(self.path)
+        if size:
+            with open(self.path, "rb") as file:
+                self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__mapped_size = size
+
+    def __raw(self, index) -> bytes:
+        """
+        Return the encoded block at a position
+
+        Args:
+            index: position of the block (non negative)
+        """
+        start = self.__offsets[index]
+        if index + 1 < len(self.__offsets):
+            end = self.__offsets[index + 1]
+        else:
+            end = self.__end
+        if self.__map is None or end > self.__mapped_size:
+            self.__remap()
+        return self.__map[start:end]
+
+    @staticmethod
+    def encode(block) -> bytes:
+        """
+        Return the json line a block is stored as
+
+        Args:
+            block: the block to encode
+        """
+        dict_block = block.__dict__.copy()
+        dict_block["transactions"] = [tx.__dict__ for tx in dict_block["transactions"]]
+        return json.dumps(dict_block).encode("utf-8") + b"\n"
+
+    @staticmethod
+    def decode(raw) -> Block:
+        """
+        Return the block stored in a json line
+
+        Args:
+            raw: the encoded block
+        """
+        return Block.from_dict(json.loads(raw))
+
+    @staticmethod
+    def rebuild_index(path) -> int:
+        """
+        Write the index file of a data file again from
+        the line breaks in it, return the number of blocks.
+        Opening a chain with a lost index would drop its blocks.
+
+        Args:
+            path: path of the data file
+        """
+        offsets = array("Q")
+        with open(path, "rb") as file:
+            offset = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                offsets.append(offset)
+                offset += len(line)
+        with open(path + ".idx", "wb") as file:
+            file.write(offsets.tobytes())
+        return len(offsets)
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def __getitem__(self, index) -> Any:
+        with self.__lock:
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("block index out of range")
+            if index == len(self) - 1 and self.__tip is not None:
+                return self.__tip
+            block = self.decode(self.__raw(index))
+            if index == len(self) - 1:
+                self.__tip = block
+            return block
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def raw(self, index) -> bytes:
+        """
+        Return the json line of a block without decoding it
+
+        Args:
+            index: position of the block
+        """
+        with self.__lock:
+            if index < 0:
+                index += len(self)
+            return self.__raw(index)
+
+    def append(self, block) -> None:
+        """
+        Append a block to the data file and the index
+
+        Args:
+            block: the block to append
+        """
+        encoded = self.encode(block)
+        with self.__lock:
+            with open(self.path, "ab") as file:
+                file.write(encoded)
+            offset = self.__end
+            self.__end += len(encoded)
+            self.__offsets.append(offset)
+            with open(self.index_path, "ab") as file:
+                file.write(array("Q", [offset]).tobytes())
+            self.__tip = block
+
+    def truncate(self, length) -> None:
+        """
+        Drop all blocks from a position onwards
+
+        Args:
+            length: number of blocks to keep
+        """
+        with self.__lock:
+            if length >= len(self.__offsets):
+                return
+            end = self.__offsets[length]
+            del self.__offsets[length:]
+            self.close()
+            with open(self.path, "r+b") as file:
+                file.truncate(end)
+            with open(self.index_path, "wb") as file:
+                file.write(self.__offsets.tobytes())
+            self.__end = end
+            self.__tip = None
+            self.generation += 1
+
+    def replace(self, blocks) -> None:
+        """
+        Replace all stored blocks, the new files are
+        written next to the old ones and swapped in
+
+        Args:
+            blocks: the new chain
+        """
+        offsets = array("Q")
+        end = 0
+        with self.__lock:
+            with open(self.path + ".tmp", "wb") as file:
+                for block in blocks:
+                    encoded = self.encode(block)
+                    file.write(encoded)
+                    offsets.append(end)
+                    end += len(encoded)
+            with open(self.index_path + ".tmp", "wb") as file:
+                file.write(offsets.tobytes())
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+                self.__mapped_size = 0
+            os.replace(self.path + ".tmp", self.path)
+            os.replace(self.index_path + ".tmp", self.index_path)
+            self.__offsets = offsets
+            self.__end = end
+            self.__tip = None
+            self.generation += 1
+
+    def remove(self) -> None:
+        """
+        Release the memory map and delete the files
+        """
+        self.close()
+        for file_path in (self.path, self.index_path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """
+        Release the memory map
+        """
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+                self.__mapped_size = 0
@@ -0,0 +1,352 @@
+import os
+import json
+import sqlite3
+from threading import Lock
+from argparse import ArgumentParser
+
+from block.block import Block, PrunedBlock
+from block.checkpoint import Checkpoint
+from transact.transaction import SCHEME_RSA, Transaction
+from utility.hash_util import hash_block
+from storage.store import ChainStore, TextStore
+
+
+# amount and timestamp are declared without a type so that
+# sqlite keeps ints as ints and floats as floats, both end
+# up in hashes and signatures and must not change form
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    idx           INTEGER PRIMARY KEY,
+    hash          TEXT NOT NULL UNIQUE,
+    previous_hash TEXT NOT NULL,
+    timestamp     NOT NULL,
+    proof         INTEGER NOT NULL,
+    version       INTEGER NOT NULL,
+    tx_digest     TEXT
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    block_idx INTEGER NOT NULL REFERENCES blocks(idx) ON DELETE CASCADE,
+    position  INTEGER NOT NULL,
+    sender    TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    amount    NOT NULL,
+    scheme    TEXT NOT NULL DEFAULT 'rsa',
+    PRIMARY KEY (block_idx, position)
+);
+CREATE INDEX IF NOT EXISTS transactions_sender ON transactions(sender);
+CREATE INDEX IF NOT EXISTS transactions_recipient ON transactions(recipient);
+CREATE TABLE IF NOT EXISTS mempool (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender    TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    amount    NOT NULL,
+    scheme    TEXT NOT NULL DEFAULT 'rsa'
+);
+CREATE INDEX IF NOT EXISTS mempool_sender ON mempool(sender);
+CREATE TABLE IF NOT EXISTS peers (
+    host TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    idx        INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    balances   TEXT NOT NULL
+);
+"""
+
+
+class SqliteStore(ChainStore):
+    """
+    Store the node in a sqlite database in WAL mode,
+    every block is committed in a single transaction.
+    Pruned blocks keep their row with the digest of
+    their transactions, the transaction rows are deleted.
+
+    Attributes:
+        path       : path of the database
+        legacy_path: text file which is migrated on first use
+    """
+
+    def __init__(self, path, legacy_path=None) -> None:
+        self.path = path
+        self.legacy_path = legacy_path
+        self.__lock = Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute("PRAGMA foreign_keys=ON")
+        self.__db.executescript(SCHEMA)
+        self.__upgrade()
+        if legacy_path is not None and self.is_empty() and os.path.exists(legacy_path):
+            self.migrate(TextStore(legacy_path))
+
+    def __upgrade(self) -> None:
+        """
+        Add the columns databases created by older
+        versions of the store are missing
+        """
+        for table in ("transactions", "mempool"):
+            columns = [row[1] for row in self.__db.execute(f"PRAGMA table_info({table})")]
+            if "scheme" not in columns:
+                self.__db.execute(
+                    f"ALTER TABLE {table} ADD COLUMN scheme TEXT NOT NULL DEFAULT '{SCHEME_RSA}'"
+                )
+        columns = [row[1] for row in self.__db.execute("PRAGMA table_info(blocks)")]
+        if "tx_digest" not in columns:
+            self.__db.execute("ALTER TABLE blocks ADD COLUMN tx_digest TEXT")
+        self.__db.commit()
+
+    def is_empty(self) -> bool:
+        """
+        Return True if no block was stored yet
+        """
+        with self.__lock:
+            return self.__db.execute("SELECT 1 FROM blocks LIMIT 1").fetchone() is None
+
+    def migrate(self, store) -> bool:
+        """
+        Copy everything from another store, return
+        True if there was anything to copy
+
+        Args:
+            store: the store to copy from
+        """
+        chain, open_transactions, peer_nodes = store.load()
+        if chain is None:
+            return False
+        self.save(chain, open_transactions, peer_nodes)
+        checkpoint = store.load_checkpoint()
+        if checkpoint is not None:
+            self.prune(checkpoint, chain, open_transactions, peer_nodes)
+        return True
+
+    def load(self) -> tuple:
+        with self.__lock:
+            blocks = self.__db.execute(
+                "SELECT idx, previous_hash, timestamp, proof, version, tx_digest"
+                " FROM blocks ORDER BY idx"
+            ).fetchall()
+            if not blocks:
+                chain = None
+            else:
+                transactions = {}
+                for block_idx, *tx in self.__db.execute(
+                    "SELECT block_idx, sender, recipient, signature, amount, scheme"
+                    " FROM transactions ORDER BY block_idx, position"
+                ):
+                    transactions.setdefault(block_idx, []).append(Transaction(*tx))
+                chain = [
+                    Block(idx, previous_hash, transactions.get(idx, []), proof, timestamp, version)
+                    if tx_digest is None
+                    else PrunedBlock(idx, previous_hash, tx_digest, proof, timestamp, version)
+                    for idx, previous_hash, timestamp, proof, version, tx_digest in blocks
+                ]
+            open_transactions = [
+                Transaction(*tx)
+                for tx in self.__db.execute(
+                    "SELECT sender, recipient, signature, amount, scheme"
+                    " FROM mempool ORDER BY id"
+                )
+            ]
+            peer_nodes = [host for (host,) in self.__db.execute("SELECT host FROM peers")]
+        return chain, open_transactions, peer_nodes
+
+    def __insert_block(self, block) -> None:
+        self.__db.execute(
+            "INSERT INTO blocks"
+            " (idx, hash, previous_hash, timestamp, proof, version, tx_digest)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                block.index,
+                hash_block(block),
+                block.previous_hash,
+                block.timestamp,
+                block.proof,
+                block.version,
+                getattr(block, "tx_digest", None),
+            ),
+        )
+        self.__db.executemany(
+            "INSERT INTO transactions"
+            " (block_idx, position, sender, recipient, signature, amount, scheme)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    block.index,
+                    position,
+                    tx.sender,
+                    tx.recipient,
+                    tx.signature,
+                    tx.amount,
+                    tx.scheme,
+                )
+                for position, tx in enumerate(block.transactions)
+            ],
+        )
+
+    def __replace_mempool(self, open_transactions) -> None:
+        self.__db.execute("DELETE FROM mempool")
+        self.__db.executemany(
+            "INSERT INTO mempool (sender, recipient, signature, amount, scheme)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [
+                (tx.sender, tx.recipient, tx.signature, tx.amount, tx.scheme)
+                for tx in open_transactions
+            ],
+        )
+
+    def __replace_peers(self, peer_nodes) -> None:
+        self.__db.execute("DELETE FROM peers")
+        self.__db.executemany(
+            "INSERT INTO peers (host) VALUES (?)", [(host,) for host in peer_nodes]
+        )
+
+    def save(self, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            self.__db.execute("DELETE FROM transactions")
+            self.__db.execute("DELETE FROM blocks")
+            for block in chain:
+                self.__insert_block(block)
+            self.__replace_mempool(open_transactions)
+            self.__replace_peers(peer_nodes)
+
+    def add_block(self, block, chain, open_transactions, peer_nodes) -> None:
+        self.add_blocks([block], chain, open_transactions, peer_nodes)
+
+    def add_blocks(self, blocks, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            for block in blocks:
+                self.__insert_block(block)
+            self.__replace_mempool(open_transactions)
+
+    def rollback(self, length, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            self.__db.execute("DELETE FROM transactions WHERE block_idx >= ?", (length,))
+            self.__db.execute("DELETE FROM blocks WHERE idx >= ?", (length,))
+            self.__replace_mempool(open_transactions)
+
+    def add_transaction(self, transaction, chain, open_transactions, peer_nodes) -> None:
+        self.add_transactions([transaction], chain, open_transactions, peer_nodes)
+
+    def add_transactions(self, transactions, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            self.__db.executemany(
+                "INSERT INTO mempool (sender, recipient, signature, amount, scheme)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (tx.sender, tx.recipient, tx.signature, tx.amount, tx.scheme)
+                    for tx in transactions
+                ],
+            )
+
+    def save_peers(self, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            self.__replace_peers(peer_nodes)
+
+    def load_checkpoint(self) -> Checkpoint:
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT idx, block_hash, balances FROM checkpoint WHERE id = 1"
+            ).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(row[0], row[1], json.loads(row[2]))
+
+    def prune(self, checkpoint, chain, open_transactions, peer_nodes) -> None:
+        with self.__lock, self.__db:
+            self.__db.executemany(
+                "UPDATE blocks SET tx_digest = ? WHERE idx = ? AND tx_digest IS NULL",
+                [
+                    (block.tx_digest, block.index)
+                    for block in chain[: checkpoint.index + 1]
+                    if isinstance(block, PrunedBlock)
+                ],
+            )
+            self.__db.execute(
+                "DELETE FROM transactions WHERE block_idx IN"
+                " (SELECT idx FROM blocks WHERE idx <= ? AND tx_digest IS NOT NULL)",
+                (checkpoint.index,),
+            )
+            self.__db.execute(
+                "INSERT OR REPLACE INTO checkpoint (id, idx, block_hash, balances)"
+                " VALUES (1, ?, ?, ?)",
+                (checkpoint.index, checkpoint.block_hash, json.dumps(checkpoint.balances)),
+            )
+
+    def find_block(self, block_hash) -> int:
+        """
+        Return the index of the block with a hash,
+        None if there is no such block
+
+        Args:
+            block_hash: hash of the block
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT idx FROM blocks WHERE hash = ?", (block_hash,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def transactions_of(self, address) -> list:
+        """
+        Return (block index, transaction) of all mined
+        transactions an address took part in
+
+        Args:
+            address: public key of the participant
+        """
+        with self.__lock:
+            rows = self.__db.execute(
+                "SELECT block_idx, sender, recipient, signature, amount, scheme"
+                " FROM transactions WHERE sender = ? UNION ALL"
+                " SELECT block_idx, sender, recipient, signature, amount, scheme"
+                " FROM transactions WHERE recipient = ? AND sender != ?"
+                " ORDER BY block_idx",
+                (address, address, address),
+            ).fetchall()
+        return [(block_idx, Transaction(*tx)) for block_idx, *tx in rows]
+
+    def reindex(self) -> int:
+        """
+        Compute the hash of every block again and rebuild
+        all indexes, return the number of blocks
+        """
+        chain, _, _ = self.load()
+        with self.__lock, self.__db:
+            self.__db.executemany(
+                "UPDATE blocks SET hash = ? WHERE idx = ?",
+                [(hash_block(block), block.index) for block in chain or []],
+            )
+            self.__db.execute("REINDEX")
+        return len(chain or [])
+
+    def compact(self) -> None:
+        """
+        Move the write ahead log into the database and
+        give the pages of deleted rows back to the disk
+        """
+        with self.__lock:
+            self.__db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.__db.execute("VACUUM")
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Migrate the text file of a node into a sqlite database"
+    )
+    parser.add_argument("-p", "--port", type=int, default=5000)
+    args = parser.parse_args()
+    store = SqliteStore(f"blockchain-{args.port}.db")
+    if not store.is_empty():
+        print(f"blockchain-{args.port}.db already holds a chain, nothing migrated")
+    elif store.migrate(TextStore(f"blockchain-{args.port}.txt")):
+        print(f"Migrated blockchain-{args.port}.txt to blockchain-{args.port}.db")
+    else:
+        print(f"No chain found in blockchain-{args.port}.txt")
+    store.close()
@@ -0,0 +1,214 @@
+import json
+from abc import ABC, abstractmethod
+
+from block.checkpoint import Checkpoint
+from transact.transaction import SCHEME_RSA, Transaction
+from block.block import Block
+
+
+class ChainStore(ABC):
+    """
+    Interface for the persistence of a node
+
+    Every write receives the full state of the node so
+    that simple stores can just rewrite everything, stores
+    with partial updates only use the parts they need.
+    A store has to implement load, save and prune.
+    """
+
+    @abstractmethod
+    def load(self) -> tuple:
+        """
+        Return the stored (chain, open_transactions, peer_nodes),
+        chain is None if nothing was stored yet
+        """
+
+    @abstractmethod
+    def save(self, chain, open_transactions, peer_nodes) -> None:
+        """
+        Replace everything that is stored
+
+        Args:
+            chain: all blocks of the chain
+            open_transactions: the open transactions
+            peer_nodes: hosts of the peer nodes
+        """
+
+    def add_block(self, block, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store a block which was appended to the chain
+        together with the remaining open transactions
+
+        Args:
+            block: the new block
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def add_blocks(self, blocks, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store several blocks which were appended to
+        the chain at once
+
+        Args:
+            blocks: the new blocks
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def rollback(self, length, chain, open_transactions, peer_nodes) -> None:
+        """
+        Drop all stored blocks from an index onwards,
+        e.g. when the chain switches to another branch
+
+        Args:
+            length: number of blocks to keep
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def add_transaction(self, transaction, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store a transaction which was added to the
+        open transactions
+
+        Args:
+            transaction: the new open transaction
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def add_transactions(self, transactions, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store several transactions which were added
+        to the open transactions at once
+
+        Args:
+            transactions: the new open transactions
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def save_peers(self, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store the current peer nodes
+        """
+        self.save(chain, open_transactions, peer_nodes)
+
+    def load_checkpoint(self) -> Checkpoint:
+        """
+        Return the stored checkpoint, None if
+        the chain was never pruned
+        """
+        return None
+
+    @abstractmethod
+    def prune(self, checkpoint, chain, open_transactions, peer_nodes) -> None:
+        """
+        Store a checkpoint and drop the transactions
+        of all blocks up to it
+
+        Args:
+            checkpoint: state of the chain up to the last pruned block
+        """
+
+    def close(self) -> None:
+        """
+        Release any resources held by the store
+        """
+
+
+class TextStore(ChainStore):
+    """
+    Store the node in three json lines of a text file
+    (chain, open transactions and peer nodes), a pruned
+    chain adds its checkpoint as a fourth line
+
+    Attributes:
+        path      : path of the text file
+        mapped    : the chain lives in a memory mapped file and
+                    is not written to the text file
+        checkpoint: checkpoint of the pruned chain
+    """
+
+    def __init__(self, path, mapped=False) -> None:
+        self.path = path
+        self.mapped = mapped
+        self.checkpoint = None
+
+    def load(self) -> tuple:
+        try:
+            with open(self.path, mode="r") as file:
+                file_content = file.readlines()
+                blockchain = json.loads(file_content[0][:-1])
+                updated_blockchain = [
+                    Block.from_dict(block) for block in blockchain
+                ]
+                open_transactions = json.loads(file_content[1][:-1])
+                updated_transactions = [
+                    Transaction(
+                        tx["sender"],
+                        tx["recipient"],
+                        tx["signature"],
+                        tx["amount"],
+                        tx.get("scheme", SCHEME_RSA),
+                    )
+                    for tx in open_transactions
+                ]
+                peer_nodes = json.loads(file_content[2])
+                return updated_blockchain, updated_transactions, peer_nodes
+        except (IOError, IndexError):
+            return None, [], []
+
+    def save(self, chain, open_transactions, peer_nodes) -> None:
+        try:
+            with open(self.path, mode="w") as file:
+                # a memory mapped chain is written block by block
+                # as it grows, only the other data is stored here
+                saveable_chain = [] if self.mapped else [
+                    dict(
+                        block_el.__dict__,
+                        transactions=[tx.__dict__ for tx in block_el.transactions],
+                    )
+                    for block_el in chain
+                ]
+                file.write(json.dumps(saveable_chain))
+                file.write("\n")
+                saveable_tx = [tx.__dict__.copy() for tx in open_transactions]
+                file.write(json.dumps(saveable_tx))
+                file.write("\n")
+                file.write(json.dumps(list(peer_nodes)))
+                if self.checkpoint is not None:
+                    file.write("\n")
+                    file.write(json.dumps(self.checkpoint.__dict__))
+        except IOError:
+            print("Saving Failed!")
+
+    def load_checkpoint(self) -> Checkpoint:
+        try:
+            with open(self.path, mode="r") as file:
+                file_content = file.readlines()
+            if len(file_content) > 3 and file_content[3].strip():
+                self.checkpoint = Checkpoint.from_dict(json.loads(file_content[3]))
+        except IOError:
+            pass
+        return self.checkpoint
+
+    def prune(self, checkpoint, chain, open_transactions, peer_nodes) -> None:
+        self.checkpoint = checkpoint
+        self.save(chain, open_transactions, peer_nodes)
+
+
+def open_store(kind, node_id, mapped=False) -> ChainStore:
+    """
+    Return the store of a node
+
+    Args:
+        kind: "text" or "sqlite"
+        node_id: unique id of the node (its port)
+        mapped: the chain lives in a memory mapped file
+    """
+    if kind == "text":
+        return TextStore(f"blockchain-{node_id}.txt", mapped)
+    if kind == "sqlite":
+        if mapped:
+            raise ValueError("The sqlite store keeps the chain itself")
+        from storage.sqlite_store import SqliteStore
+
+        return SqliteStore(f"blockchain-{node_id}.db", f"blockchain-{node_id}.txt")
+    raise ValueError(f"Unknown store: {kind}")
@@ -0,0 +1,139 @@
+import queue
+from threading import Lock, Thread
+
+from transact.wallet import Wallet
+from transact.transaction import Transaction
+
+
+# Initialize the limits of the ingestion pipeline
+INTAKE_QUEUE_SIZE: int = 1000
+COMMIT_QUEUE_SIZE: int = 1000
+VALIDATION_WORKERS: int = 4
+COMMIT_BATCH: int = 100
+
+
+class TransactionIngestor:
+    """
+    Take in transactions broadcast by peer nodes without
+    holding up the request: a pool of workers checks the
+    signatures and a single committer adds the valid ones
+    to the open transactions in batches. Both queues are
+    bounded, a full intake queue sheds new transactions
+    and a full commit queue makes the workers wait.
+
+    Attributes:
+        commit  : function adding verified transactions, returns a bool per transaction
+        intake  : transactions waiting for validation(private)
+        verified: transactions waiting to be committed(private)
+        counters: number of transactions per outcome(private)
+    """
+
+    def __init__(
+        self,
+        commit,
+        workers=VALIDATION_WORKERS,
+        intake_size=INTAKE_QUEUE_SIZE,
+        commit_size=COMMIT_QUEUE_SIZE,
+    ) -> None:
+        self.commit = commit
+        self.__intake = queue.Queue(intake_size)
+        self.__verified = queue.Queue(commit_size)
+        self.__lock = Lock()
+        self.__counters = {
+            "queued": 0,
+            "dropped": 0,
+            "invalid": 0,
+            "accepted": 0,
+            "rejected": 0,
+        }
+        self.__threads = [
+            Thread(target=self.__validate, name=f"ingest-validate-{n}", daemon=True)
+            for n in range(workers)
+        ]
+        self.__threads.append(
+            Thread(target=self.__commit, name="ingest-commit", daemon=True)
+        )
+        for thread in self.__threads:
+            thread.start()
+
+    def __count(self, outcome, n=1) -> None:
+        with self.__lock:
+            self.__counters[outcome] += n
+
+    def submit(self, values) -> bool:
+        """
+        Queue a transaction for validation, return False
+        if the queue is full and the transaction was dropped
+
+        Args:
+            values: the transaction as posted by a peer
+        """
+        try:
+            self.__intake.put_nowait(values)
+        except queue.Full:
+            self.__count("dropped")
+            return False
+        self.__count("queued")
+        return True
+
+    def depth(self) -> int:
+        """
+        Return the number of transactions which are
+        not validated or not committed yet
+        """
+        return self.__intake.qsize() + self.__verified.qsize()
+
+    def stats(self) -> dict:
+        """
+        Return the queue depths and the number of
+        transactions per outcome
+        """
+        with self.__lock:
+            stats = dict(self.__counters)
+        stats["intake_depth"] = self.__intake.qsize()
+        stats["intake_capacity"] = self.__intake.maxsize
+        stats["commit_depth"] = self.__verified.qsize()
+        stats["commit_capacity"] = self.__verified.maxsize
+        return stats
+
+    def __validate(self) -> None:
+        """
+        Check the signatures of queued transactions
+        """
+        while True:
+            values = self.__intake.get()
+            try:
+                # fields of the wrong type are rejected here, one
+                # malformed transaction must not spoil a batch
+                transaction = Transaction.from_dict(values)
+                valid = transaction.amount > 0 and Wallet.verify_transaction(
+                    transaction
+                )
+            except (KeyError, TypeError, ValueError):
+                valid = False
+            if valid:
+                # blocks while the committer is behind
+                self.__verified.put(transaction)
+            else:
+                self.__count("invalid")
+
+    def __commit(self) -> None:
+        """
+        Add verified transactions to the open transactions,
+        everything that queued up is committed at once
+        """
+        while True:
+            batch = [self.__verified.get()]
+            while len(batch) < COMMIT_BATCH:
+                try:
+                    batch.append(self.__verified.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self.commit(batch)
+            except Exception as error:
+                print(f"Committing transactions failed: {error}")
+                results = [False] * len(batch)
+            accepted = sum(1 for result in results if result)
+            self.__count("accepted", accepted)
+            self.__count("rejected", len(batch) - accepted)
@@ -0,0 +1,128 @@
+import hmac
+import secrets
+import hashlib as hl
+from threading import Lock
+
+from transact.wallet import Wallet
+from transact.transaction import SCHEME_RSA
+
+
+class Keystore:
+    """
+    Hold the wallets of every user a node serves,
+    each wallet keeps its keys in a file of its own
+    and the keystore file lists the wallet ids with
+    the digest of their secret. Wallet ids are random
+    and a wallet is only handed out for its secret.
+
+    Attributes:
+        node_id: unique id of the node (port)
+        wallets: wallets keyed by wallet id(private)
+        digests: sha-256 digest of the secret of every wallet id(private)
+    """
+
+    def __init__(self, node_id) -> None:
+        self.node_id = node_id
+        self.__wallets = {}
+        self.__digests = {}
+        self.__lock = Lock()
+        self.load()
+
+    @staticmethod
+    def digest(secret) -> str:
+        """
+        Return the digest a secret is stored as
+
+        Args:
+            secret: secret of a wallet
+        """
+        return hl.sha256(secret.encode("utf-8")).hexdigest()
+
+    def load(self) -> None:
+        """
+        Load the wallets listed in the keystore file
+        """
+        try:
+            with open(f"keystore-{self.node_id}.txt", "r") as file:
+                entries = [line.split() for line in file if line.strip()]
+        except IOError:
+            return
+        for wallet_id, *digest in entries:
+            wallet = Wallet(f"{self.node_id}-{wallet_id}")
+            if wallet.load_keys():
+                self.__wallets[wallet_id] = wallet
+                # wallets stored before secrets existed can not be unlocked
+                self.__digests[wallet_id] = digest[0] if digest else None
+
+    def save(self) -> bool:
+        """
+        Save the list of wallet ids
+        """
+        try:
+            with open(f"keystore-{self.node_id}.txt", "w") as file:
+                for wallet_id in self.__wallets:
+                    file.write(wallet_id)
+                    if self.__digests.get(wallet_id) is not None:
+                        file.write(" " + self.__digests[wallet_id])
+                    file.write("\n")
+            return True
+        except IOError:
+            print("Saving keystore failed...")
+            return False
+
+    def create(self, key_type=SCHEME_RSA) -> tuple:
+        """
+        Create and save a new wallet, return (wallet_id, wallet, secret)
+        or (None, None, None) if it could not be saved. The secret
+        is only returned here, the keystore keeps its digest.
+
+        Args:
+            key_type: signature scheme of the keys
+        """
+        wallet_id = secrets.token_hex(8)
+        secret = secrets.token_urlsafe(32)
+        wallet = Wallet(f"{self.node_id}-{wallet_id}", key_type)
+        wallet.create_keys()
+        if not wallet.save_keys():
+            return None, None, None
+        with self.__lock:
+            self.__wallets[wallet_id] = wallet
+            self.__digests[wallet_id] = self.digest(secret)
+            if not self.save():
+                del self.__wallets[wallet_id]
+                del self.__digests[wallet_id]
+                return None, None, None
+        return wallet_id, wallet, secret
+
+    def authenticate(self, wallet_id, secret) -> Wallet:
+        """
+        Return a wallet if the secret is the one it was
+        created with, None otherwise
+
+        Args:
+            wallet_id: id of the wallet
+            secret: secret handed out when the wallet was created
+        """
+        expected = self.__digests.get(wallet_id)
+        if expected is None or not secret:
+            return None
+        if not hmac.compare_digest(expected, self.digest(secret)):
+            return None
+        return self.__wallets.get(wallet_id)
+
+    def find(self, secret) -> str:
+        """
+        Return the id of the wallet a secret unlocks,
+        None if it unlocks none
+
+        Args:
+            secret: secret handed out when the wallet was created
+        """
+        if not secret:
+            return None
+        digest = self.digest(secret)
+        with self.__lock:
+            for wallet_id, expected in self.__digests.items():
+                if expected is not None and hmac.compare_digest(expected, digest):
+                    return wallet_id
+        return None
@@ -1,7 +1,13 @@
+import math
 from collections import OrderedDict
 from utility.printable import Printable
 
 
+# Signature schemes a transaction can be signed with
+SCHEME_RSA: str = "rsa"
+SCHEME_ED25519: str = "ed25519"
+
+
 class Transaction(Printable):
     """
     A transaction which can be added to the block
@@ -12,13 +18,56 @@ class Transaction(Printable):
         recipient: the recipient of the coins.
         signature: the signature of the transaction.
         amount: the amount of coins sent.
+        scheme: the signature scheme of the sender's keys.
     """
 
-    def __init__(self, sender: str, recipient: str, signature: str, amount: float):
+    def __init__(
+        self,
+        sender: str,
+        recipient: str,
+        signature: str,
+        amount: float,
+        scheme: str = SCHEME_RSA,
+    ):
         self.sender = sender
         self.recipient = recipient
         self.amount = amount
         self.signature = signature
+        self.scheme = scheme
+
+    @staticmethod
+    def from_dict(transaction) -> "Transaction":
+        """
+        Return the transaction for its dictionary form,
+        fields of the wrong type raise a TypeError so that
+        a peer can not hand in values the encoding rejects
+
+        Args:
+            transaction: the transaction as parsed from json
+        """
+        if not isinstance(transaction, dict):
+            raise TypeError("A transaction has to be an object")
+        scheme = transaction.get("scheme", SCHEME_RSA)
+        for key, value in (
+            ("sender", transaction["sender"]),
+            ("recipient", transaction["recipient"]),
+            ("signature", transaction["signature"]),
+            ("scheme", scheme),
+        ):
+            if not isinstance(value, str):
+                raise TypeError(f"The {key} of a transaction has to be a string")
+        amount = transaction["amount"]
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+            raise TypeError("The amount of a transaction has to be a number")
+        if not math.isfinite(amount):
+            raise ValueError("The amount of a transaction has to be finite")
+        return Transaction(
+            transaction["sender"],
+            transaction["recipient"],
+            transaction["signature"],
+            amount,
+            scheme,
+        )
 
     def to_ordered_dict(self):
         """
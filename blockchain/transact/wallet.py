@@ -1,9 +1,58 @@
 import binascii
 import Crypto.Random
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
+from Crypto.PublicKey import RSA, ECC
+from Crypto.Signature import PKCS1_v1_5, eddsa
 from Crypto.Hash import SHA256
 
+from transact.transaction import SCHEME_RSA, SCHEME_ED25519
+
+
+class Signer:
+    """
+    Sign transactions with a private key which is
+    parsed once, instead of on every signature
+
+    Attributes:
+        private_key: hex encoded private key the signer was built from
+        key_type   : signature scheme of the key
+    """
+    def __init__(self, private_key, key_type=SCHEME_RSA) -> None:
+        self.private_key = private_key
+        self.key_type = key_type
+        der = binascii.unhexlify(private_key)
+        if key_type == SCHEME_ED25519:
+            self.__scheme = eddsa.new(ECC.import_key(der), "rfc8032")
+        else:
+            self.__scheme = PKCS1_v1_5.new(RSA.importKey(der))
+
+    def sign(self, sender, recipient, amount) -> str:
+        """
+        Generate a signature for a transaction
+
+        Args:
+            sender: sender of the coins
+            recipient: recipient of the coins
+            amount: amount of coins
+        """
+        message = Wallet.message(sender, recipient, amount)
+        if self.key_type == SCHEME_ED25519:
+            signature = self.__scheme.sign(message)
+        else:
+            signature = self.__scheme.sign(SHA256.new(message))
+        return binascii.hexlify(signature).decode("ascii")
+
+    def sign_many(self, transactions) -> list:
+        """
+        Generate signatures for several transactions
+
+        Args:
+            transactions: (sender, recipient, amount) tuples
+        """
+        return [
+            self.sign(sender, recipient, amount)
+            for sender, recipient, amount in transactions
+        ]
+
 
 class Wallet:
     """
@@ -12,11 +61,17 @@ class Wallet:
     Attributes:
         private_key: private key for a node
         public_key : public key for a node
+        key_type   : signature scheme of the keys ("rsa" or "ed25519")
+        signer     : signer holding the parsed private key(private)
     """
-    def __init__(self, node_id) -> None:
+    def __init__(self, node_id, key_type=SCHEME_RSA) -> None:
+        if key_type not in (SCHEME_RSA, SCHEME_ED25519):
+            raise ValueError(f"Unknown key type: {key_type}")
         self.private_key = None
         self.public_key = None
         self.node_id = node_id
+        self.key_type = key_type
+        self.__signer = None
 
     def create_keys(self) -> None:
         """
@@ -25,6 +80,7 @@ class Wallet:
         private_key, public_key = self.generate_keys()
         self.private_key = private_key
         self.public_key = public_key
+        self.__signer = None
 
     def save_keys(self) -> bool:
         """
@@ -36,6 +92,8 @@ class Wallet:
                     file.write(self.public_key)
                     file.write("\n")
                     file.write(self.private_key)
+                    file.write("\n")
+                    file.write(self.key_type)
                 return True
             except (IOError, IndexError):
                 print("Saving wallet failed...")
@@ -43,15 +101,19 @@ class Wallet:
 
     def load_keys(self) -> bool:
         """
-        Read Public/Private keys from a file
+        Read Public/Private keys from a file,
+        wallets saved without a key type hold rsa keys
         """
         try:
             with open(f"wallet-{self.node_id}.txt", "r") as file:
                 keys = file.readlines()
                 public_key = keys[0].strip("\n")
-                private_key = keys[1]
+                private_key = keys[1].strip("\n")
+                key_type = keys[2].strip("\n") if len(keys) > 2 else SCHEME_RSA
                 self.public_key = public_key
                 self.private_key = private_key
+                self.key_type = key_type
+                self.__signer = None
             return True
         except (IOError, IndexError):
             print("Loading Wallet failed...")
@@ -61,13 +123,43 @@ class Wallet:
         """
         Generate Public/Private Keys
         """
-        private_key = RSA.generate(1024, Crypto.Random.new().read)
-        public_key = private_key.publickey()
+        if self.key_type == SCHEME_ED25519:
+            private_key = ECC.generate(curve="Ed25519")
+        else:
+            private_key = RSA.generate(1024, Crypto.Random.new().read)
+        public_key = private_key.public_key()
         return (
-            binascii.hexlify(private_key.exportKey(format="DER")).decode("ascii"),
-            binascii.hexlify(public_key.exportKey(format="DER")).decode("ascii"),
+            binascii.hexlify(private_key.export_key(format="DER")).decode("ascii"),
+            binascii.hexlify(public_key.export_key(format="DER")).decode("ascii"),
         )
 
+    @staticmethod
+    def message(sender, recipient, amount) -> bytes:
+        """
+        Return the signed part of a transaction
+
+        Args:
+            sender: sender of the coins
+            recipient: recipient of the coins
+            amount: amount of coins
+        """
+        return (str(sender) + str(recipient) + str(amount)).encode("utf-8")
+
+    def get_signer(self) -> Signer:
+        """
+        Return the signer for the current private key,
+        it is built again only when the keys changed
+        """
+        signer = self.__signer
+        if (
+            signer is None
+            or signer.private_key != self.private_key
+            or signer.key_type != self.key_type
+        ):
+            signer = Signer(self.private_key, self.key_type)
+            self.__signer = signer
+        return signer
+
     def sign_transaction(self, sender, recipient, amount) -> str:
         """
         Generate a signature for a transaction
@@ -77,24 +169,40 @@ class Wallet:
             recipient: recipient of the coins
             amount: amount of coins
         """
-        signer = PKCS1_v1_5.new(RSA.importKey(binascii.unhexlify(self.private_key)))
-        h = SHA256.new((str(sender) + str(recipient) + str(amount)).encode("utf-8"))
-        signature = signer.sign(h)
-        return binascii.hexlify(signature).decode("ascii")
+        return self.get_signer().sign(sender, recipient, amount)
+
+    def sign_many(self, transactions) -> list:
+        """
+        Generate signatures for several transactions
+
+        Args:
+            transactions: (sender, recipient, amount) tuples
+        """
+        return self.get_signer().sign_many(transactions)
 
     @staticmethod
     def verify_transaction(transaction) -> str:
         """
-        Verify a transaction
+        Verify a transaction with the signature
+        scheme it is tagged with
 
         Args:
             transaction: actual transaction object
         """
-        public_key = RSA.importKey(binascii.unhexlify(transaction.sender))
-        verifier = PKCS1_v1_5.new(public_key)
-        h = SHA256.new(
-            (
-                str(transaction.sender) + str(transaction.recipient) + str(transaction.amount)
-            ).encode("utf-8")
-        )
-        return verifier.verify(h, binascii.unhexlify(transaction.signature))
+        # keys and signatures come from peers, anything that
+        # does not decode is an invalid signature, not an error
+        try:
+            message = Wallet.message(
+                transaction.sender, transaction.recipient, transaction.amount
+            )
+            signature = binascii.unhexlify(transaction.signature)
+            if getattr(transaction, "scheme", SCHEME_RSA) == SCHEME_ED25519:
+                public_key = ECC.import_key(binascii.unhexlify(transaction.sender))
+                verifier = eddsa.new(public_key, "rfc8032")
+                verifier.verify(message, signature)
+                return True
+            public_key = RSA.importKey(binascii.unhexlify(transaction.sender))
+            verifier = PKCS1_v1_5.new(public_key)
+            return verifier.verify(SHA256.new(message), signature)
+        except (ValueError, TypeError, IndexError):
+            return False
@@ -0,0 +1,115 @@
+import struct
+import hashlib as hl
+from weakref import WeakKeyDictionary
+
+
+# Encoding versions - blocks stored before the binary encoding
+# existed carry no version and are hashed the legacy (json) way
+LEGACY_VERSION: int = 0
+CURRENT_VERSION: int = 1
+
+# Per object caches, keyed weakly so that dropping a block or a
+# transaction also drops its cached encoding
+_tx_cache = WeakKeyDictionary()
+_header_cache = WeakKeyDictionary()
+
+
+def _pack_str(value) -> bytes:
+    """
+    Encode a string as a 4 byte length
+    followed by its utf-8 bytes
+
+    Args:
+        value: the string to encode
+    """
+    raw = str(value).encode("utf-8")
+    return struct.pack(">I", len(raw)) + raw
+
+
+def encode_transaction(transaction) -> bytes:
+    """
+    Return the canonical byte encoding of a
+    transaction (sender, recipient & amount),
+    computed once per transaction object
+
+    Args:
+        transaction: the transaction to encode
+    """
+    try:
+        return _tx_cache[transaction]
+    except KeyError:
+        pass
+    encoded = (
+        _pack_str(transaction.sender)
+        + _pack_str(transaction.recipient)
+        + struct.pack(">d", float(transaction.amount))
+    )
+    _tx_cache[transaction] = encoded
+    return encoded
+
+
+def encode_transactions(transactions) -> bytes:
+    """
+    Return the canonical byte encoding of
+    a list of transactions
+
+    Args:
+        transactions: the transactions to encode
+    """
+    return struct.pack(">I", len(transactions)) + b"".join(
+        encode_transaction(tx) for tx in transactions
+    )
+
+
+def transactions_digest(transactions) -> bytes:
+    """
+    Return the sha-256 digest a block header
+    commits to its transactions with
+
+    Args:
+        transactions: the transactions of the block
+    """
+    return hl.sha256(encode_transactions(transactions)).digest()
+
+
+def encode_block_header(block) -> bytes:
+    """
+    Return the canonical byte encoding of a block
+    header, the transactions are committed to by
+    the sha-256 digest of their encoding, pruned
+    blocks carry that digest instead of the transactions
+
+    Args:
+        block: the block to encode
+    """
+    try:
+        return _header_cache[block]
+    except KeyError:
+        pass
+    tx_digest = getattr(block, "tx_digest", None)
+    if tx_digest is None:
+        tx_digest = transactions_digest(block.transactions)
+    else:
+        tx_digest = bytes.fromhex(tx_digest)
+    encoded = (
+        struct.pack(">BQ", block.version, block.index)
+        + _pack_str(block.previous_hash)
+        + struct.pack(">dQ", float(block.timestamp), block.proof)
+        + tx_digest
+    )
+    _header_cache[block] = encoded
+    return encoded
+
+
+def proof_prefix(transactions, last_hash) -> bytes:
+    """
+    Return the part of the proof of work input
+    which stays the same for every guessed proof
+
+    Args:
+        transactions: the transactions of the block
+        last_hash: the hash of the previous block
+    """
+    return bytes([CURRENT_VERSION]) + encode_transactions(transactions) + _pack_str(
+        last_hash
+    )
@@ -0,0 +1,78 @@
+import json
+from collections import deque
+from threading import Condition
+
+
+# Initialize the number of events kept for reconnecting clients
+EVENT_BUFFER: int = 1000
+
+# Initialize the seconds a client waits before a keepalive is sent
+KEEPALIVE: float = 15.0
+
+
+class EventBus:
+    """
+    Fan out changes of a node to any number of
+    listeners, every event is encoded once as a
+    server-sent event and handed out to all of them
+
+    Attributes:
+        events : (id, encoded event) of the latest events(private)
+        last_id: id of the latest event
+    """
+
+    def __init__(self, size=EVENT_BUFFER) -> None:
+        self.__events = deque(maxlen=size)
+        self.__condition = Condition()
+        self.last_id = 0
+
+    @staticmethod
+    def encode(event_id, kind, data) -> bytes:
+        """
+        Return the server-sent event encoding of an event
+
+        Args:
+            event_id: id of the event
+            kind: name of the event e.g. "block"
+            data: json serializable payload
+        """
+        return (
+            f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+        ).encode("utf-8")
+
+    def publish(self, kind, data) -> int:
+        """
+        Record an event and wake up all listeners,
+        return the id of the event
+
+        Args:
+            kind: name of the event e.g. "block"
+            data: json serializable payload
+        """
+        with self.__condition:
+            self.last_id += 1
+            self.__events.append((self.last_id, self.encode(self.last_id, kind, data)))
+            self.__condition.notify_all()
+            return self.last_id
+
+    def since(self, event_id, timeout=KEEPALIVE) -> list:
+        """
+        Return (id, encoded event) of the events after
+        an id, waiting up to a timeout for one to arrive.
+        Returns None if events after the id were already
+        dropped, the listener has to reload its state then.
+
+        Args:
+            event_id: id of the last event the listener got
+            timeout: seconds to wait for a new event
+        """
+        with self.__condition:
+            if event_id > self.last_id:
+                return None
+            if event_id == self.last_id:
+                self.__condition.wait(timeout)
+            if not self.__events or event_id >= self.last_id:
+                return []
+            if self.__events[0][0] > event_id + 1:
+                return None
+            return [event for event in self.__events if event[0] > event_id]
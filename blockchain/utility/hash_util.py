@@ -1,6 +1,8 @@
 import json
 import hashlib as hl
 
+from utility.encoding import LEGACY_VERSION, encode_block_header
+
 
 def hash_string_256(string: str) -> str:
     """
@@ -17,12 +19,27 @@ def hash_string_256(string: str) -> str:
 def hash_block(block: dict) -> str:
     """
     Hashes a block and returns a string representation
-    of it
+    of it, using the encoding the block was created with
+
+    Args:
+        block: block of which the hash is to be generated
+    """
+    if getattr(block, "version", LEGACY_VERSION) == LEGACY_VERSION:
+        return hash_block_legacy(block)
+    return hl.sha256(encode_block_header(block)).hexdigest()
+
+
+def hash_block_legacy(block: dict) -> str:
+    """
+    Hashes a block the way blocks were hashed before
+    the binary encoding, kept so that existing chains
+    still verify
 
     Args:
         block: block of which the hash is to be generated
     """
     hashable_block = block.__dict__.copy()
+    hashable_block.pop("version", None)
     hashable_block["transactions"] = [
         tx.to_ordered_dict() for tx in hashable_block["transactions"]
     ]
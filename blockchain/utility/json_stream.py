@@ -0,0 +1,79 @@
+import json
+import zlib
+import codecs
+
+
+# Size of the chunks read from a streamed response
+CHUNK_SIZE: int = 64 * 1024
+
+
+def json_array_chunks(items):
+    """
+    Yield a json array piece by piece
+
+    Args:
+        items: json encoded elements of the array (bytes)
+    """
+    yield b"["
+    first = True
+    for item in items:
+        if not first:
+            yield b","
+        first = False
+        yield item
+    yield b"]"
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Yield the gzip compressed form of a stream of chunks
+
+    Args:
+        chunks: the raw chunks (bytes)
+        level: the compression level
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a json array while it is
+    read chunk by chunk, without holding the whole
+    document in memory
+
+    Args:
+        chunks: the document split into chunks (bytes)
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a json array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # the element continues in the next chunk
+                break
+            yield element
+        buffer = buffer[position:]
+    raise ValueError("Json array ended unexpectedly")
@@ -0,0 +1,65 @@
+import hashlib as hl
+from threading import Lock
+
+
+class ResponseCache:
+    """
+    Cache the body of the latest response per route,
+    an entry is only valid for the state key it was
+    built for (e.g. tip hash and mempool version), so
+    any change of the state invalidates it
+
+    Attributes:
+        entries: (key, body) of every route(private)
+    """
+
+    def __init__(self) -> None:
+        self.__entries = {}
+        self.__lock = Lock()
+
+    @staticmethod
+    def etag(route, key) -> str:
+        """
+        Return the entity tag of a route for a state key
+
+        Args:
+            route: name of the route
+            key: tuple describing the state the response depends on
+        """
+        return hl.sha256(repr((route, key)).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, route, key) -> bytes:
+        """
+        Return the cached body of a route, None if it
+        was built for another state
+
+        Args:
+            route: name of the route
+            key: tuple describing the current state
+        """
+        with self.__lock:
+            entry = self.__entries.get(route)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def put(self, route, key, body) -> bytes:
+        """
+        Cache the body of a route, replacing the entry
+        for any older state
+
+        Args:
+            route: name of the route
+            key: tuple describing the state the body was built for
+            body: the encoded response body
+        """
+        with self.__lock:
+            self.__entries[route] = (key, body)
+        return body
+
+    def clear(self) -> None:
+        """
+        Drop all cached bodies
+        """
+        with self.__lock:
+            self.__entries = {}
@@ -1,7 +1,14 @@
+import struct
+import hashlib as hl
 from typing import Any
 
 from transact.wallet import Wallet
 from utility.hash_util import hash_string_256, hash_block
+from utility.encoding import LEGACY_VERSION, CURRENT_VERSION, proof_prefix
+
+
+# Initailize the mining reward
+MINING_REWARD: float = 10.0
 
 
 class Verification:
@@ -14,7 +21,7 @@ class Verification:
     # and is not accessing anything from the class and hence is a
     # use case for @staticmethod
     @staticmethod
-    def valid_proof(transactions, last_hash, proof) -> bool:
+    def valid_proof(transactions, last_hash, proof, version=CURRENT_VERSION) -> bool:
         """
         Validate a proof of work and see if it solves the puzzle algorithm
 
@@ -22,56 +29,136 @@ class Verification:
             transactions: the transactions of the block for which the proof is calculated
             last_hash: the previous block's hash which will be stored in the next block
             proof: the proof we are testing
+            version: the encoding version of the block
+        """
+        if version == LEGACY_VERSION:
+            guess = (
+                str([tx.to_ordered_dict() for tx in transactions])
+                + str(last_hash)
+                + str(proof)
+            ).encode()
+            guess_hash = hash_string_256(guess)
+            return guess_hash[0:2] == "00"
+        return Verification.solves(
+            Verification.proof_hasher(transactions, last_hash), proof
+        )
+
+    # the prefix of the proof of work input is fixed for a block,
+    # hashing it once and copying the hasher state per guess keeps
+    # proof_of_work from re-encoding the transactions every attempt
+    @staticmethod
+    def proof_hasher(transactions, last_hash) -> Any:
+        """
+        Return a sha-256 hasher primed with the fixed part
+        of the proof of work input, to be used with solves()
+
+        Args:
+            transactions: the transactions of the block for which the proof is calculated
+            last_hash: the previous block's hash which will be stored in the next block
+        """
+        return hl.sha256(proof_prefix(transactions, last_hash))
+
+    @staticmethod
+    def solves(hasher, proof) -> bool:
+        """
+        Check if a proof solves the puzzle for a primed hasher
+
+        Args:
+            hasher: hasher returned by proof_hasher()
+            proof: the proof we are testing
         """
-        guess = (
-            str([tx.to_ordered_dict() for tx in transactions])
-            + str(last_hash)
-            + str(proof)
-        ).encode()
-        guess_hash = hash_string_256(guess)
-        return guess_hash[0:2] == "00"
+        guess = hasher.copy()
+        guess.update(struct.pack(">Q", proof))
+        return guess.digest()[0] == 0
+
+    @classmethod
+    def verify_block(cls, previous_block, block, checkpoint=None) -> bool:
+        """
+        Verify that a block follows its predecessor and
+        that its proof of work is valid. Blocks up to a
+        checkpoint are trusted, only their links are followed.
+
+        Args:
+            previous_block: the block before it in the chain
+            block: the block to verify
+            checkpoint: state of the chain up to a pruned block
+        """
+        if block.index != previous_block.index + 1:
+            return False
+        if block.previous_hash != hash_block(previous_block):
+            return False
+        if checkpoint is not None and block.index <= checkpoint.index:
+            return (
+                block.index != checkpoint.index
+                or hash_block(block) == checkpoint.block_hash
+            )
+        if getattr(block, "tx_digest", None) is not None:
+            # a pruned block can only be trusted through a checkpoint
+            return False
+        if not cls.valid_proof(
+            block.transactions[:-1],
+            block.previous_hash,
+            block.proof,
+            getattr(block, "version", LEGACY_VERSION),
+        ):
+            print("Proof of work is invalid")
+            return False
+        return True
 
     # fn() verify chain accesses valid_proof() method,
     # but an instance of the class in not required and
     # hence is a good use case for @classmethod
     @classmethod
-    def verify_chain(cls, blockchain) -> bool:
+    def verify_chain(cls, blockchain, checkpoint=None) -> bool:
         """
         Verify the current blockchain and return True 
-        if it's valid., False if proof of work is invalid
+        if it's valid., False if proof of work is invalid.
+        Blocks up to a checkpoint are trusted, only their
+        links are followed, and the chain has to pass
+        through the checkpoint.
 
         Args:
             blockchain: the blockchain to verify
+            checkpoint: state of the chain up to a pruned block
         """
+        # keep the previous block around instead of indexing back
+        # into the chain, which may decode blocks from disk
+        previous_block = None
+        length = 0
         for (index, block) in enumerate(blockchain):
+            length = index + 1
             if index == 0:
+                previous_block = block
                 continue
-            if block.previous_hash != hash_block(blockchain[index - 1]):
+            if not cls.verify_block(previous_block, block, checkpoint):
                 return False
-            if not cls.valid_proof(
-                block.transactions[:-1], block.previous_hash, block.proof
-            ):
-                print("Proof of work is invalid")
-                return False
-        return True
+            previous_block = block
+        return checkpoint is None or length > checkpoint.index
 
     # method verify_transaction has no class dependencies
     # and hence is a @static method
     @staticmethod
-    def verify_transaction(transaction: dict, get_balance, check_funds=True) -> bool:
+    def verify_transaction(
+        transaction: dict, get_balance, check_funds=True, check_signature=True
+    ) -> bool:
         """
         Verify the transaction by checking wether the sender has
         sufficient coins
         Args:
             transaction: transaction that should be cerified
+            check_signature: False if the signature was checked before
         """
+        # a negative amount would move coins away from the recipient
+        amount = transaction.amount
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+            return False
+        if not amount > 0:
+            return False
         if check_funds:
             sender_balance = get_balance(transaction.sender)
-            return sender_balance >= transaction.amount and Wallet.verify_transaction(
-                transaction
-            )
-        else:
-            return Wallet.verify_transaction(transaction)
+            if sender_balance < transaction.amount:
+                return False
+        return not check_signature or Wallet.verify_transaction(transaction)
 
     # method - verify transactions has a class dependency on the
     # verify transaction method and hence is a @classmethod
@@ -83,3 +170,64 @@ class Verification:
         return all(
             [cls.verify_transaction(tx, get_balance, False) for tx in open_transactions]
         )
+
+    @classmethod
+    def verify_block_transactions(
+        cls, block, get_balance, changes, check_signatures=True
+    ) -> bool:
+        """
+        Verify the transactions of a block on top of the chain
+        before it: every transfer is positive and funded in order,
+        and the block ends in exactly one mining reward
+
+        Args:
+            block: the block to verify
+            get_balance: balance of an address before the changes
+            changes: balance changes on top of get_balance, updated
+                        with the transactions of the block
+            check_signatures: False if the signatures were checked before
+        """
+        if getattr(block, "tx_digest", None) is not None or not block.transactions:
+            return False
+        *transfers, reward = block.transactions
+        if reward.sender != "MINING" or reward.amount != MINING_REWARD:
+            return False
+
+        def funds(address):
+            return get_balance(address) + changes.get(address, 0.0)
+
+        for tx in transfers:
+            if tx.sender == "MINING" or not cls.verify_transaction(
+                tx, funds, check_signature=check_signatures
+            ):
+                return False
+            changes[tx.sender] = changes.get(tx.sender, 0.0) - tx.amount
+            changes[tx.recipient] = changes.get(tx.recipient, 0.0) + tx.amount
+        changes[reward.recipient] = changes.get(reward.recipient, 0.0) + reward.amount
+        return True
+
+    @classmethod
+    def first_invalid_transactions(
+        cls, blockchain, checkpoint=None, check_signatures=True
+    ) -> int:
+        """
+        Replay the transactions of a chain from its genesis
+        block or checkpoint, return the index of the first
+        block whose transactions are invalid or None
+
+        Args:
+            blockchain: the blockchain to verify
+            checkpoint: state of the chain up to a pruned block
+            check_signatures: False if the signatures were checked before
+        """
+        changes = {} if checkpoint is None else dict(checkpoint.balances)
+        for block in blockchain:
+            if block.index == 0:
+                continue
+            if checkpoint is not None and block.index <= checkpoint.index:
+                continue
+            if not cls.verify_block_transactions(
+                block, lambda address: 0.0, changes, check_signatures
+            ):
+                return block.index
+        return None